@@ -4,6 +4,10 @@ Simple restart watcher helper.
 - Monitors admin-backend/tmp/restart-requests.jsonl for new lines.
 - When a new line appears, runs the configured RESTART_COMMAND (env var).
 - Marks processed entries by moving them into processed-<timestamp>.jsonl or appending to processed.jsonl
+- With RELOAD_MODE=rolling, requests for the python bot are handled as a
+  zero-downtime rolling reload of its gunicorn workers instead (see
+  rolling_reload()). A request for "all" then reloads the bot that way and
+  runs RESTART_COMMAND for each other program in RESTART_ALL_TARGETS.
 
 Usage:
   python scripts/restart_watcher.py
@@ -13,7 +17,11 @@ Run this as a privileged service (systemd / supervisor) if you want automatic re
 import os
 import time
 import json
+import signal
 import subprocess
+import threading
+import urllib.request
+import urllib.error
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
@@ -24,6 +32,25 @@ PROCESSED = TMP_DIR / 'restart-processed.jsonl'
 RESTART_COMMAND = os.environ.get('RESTART_COMMAND')
 POLL_INTERVAL = float(os.environ.get('RESTART_WATCH_INTERVAL', '2'))
 
+# Rolling reload settings (RELOAD_MODE=rolling). The bot's gunicorn must be
+# started with --pid GUNICORN_PID_FILE, and its workers write their status
+# files to WORKER_STATE_DIR (see python-bot/worker_state.py). The defaults
+# assume admin-backend and python-bot are siblings; in the supervisord
+# layout (/srv/admin-backend, /app/python-bot) set both explicitly.
+BOT_DIR = ROOT.parent / 'python-bot'
+RELOAD_MODE = os.environ.get('RELOAD_MODE', 'command').lower()
+ROLLING_TARGETS = [t.strip() for t in os.environ.get('ROLLING_TARGETS', 'python-bot').split(',') if t.strip()]
+# Programs that target "all" (the default of POST /api/system/restart) stands
+# for in rolling mode; the supervisord.conf program names
+ALL_TARGETS = [t.strip() for t in os.environ.get('RESTART_ALL_TARGETS', 'python-bot,admin-backend,admin-frontend').split(',')
+               if t.strip()]
+GUNICORN_PID_FILE = Path(os.environ.get('GUNICORN_PID_FILE', str(BOT_DIR / 'gunicorn.pid')))
+WORKER_STATE_DIR = Path(os.environ.get('WORKER_STATE_DIR', str(BOT_DIR / 'run')))
+READY_TIMEOUT = float(os.environ.get('RELOAD_READY_TIMEOUT', '120'))
+DRAIN_TIMEOUT = float(os.environ.get('RELOAD_DRAIN_TIMEOUT', '60'))
+PROBE_URL = os.environ.get('RELOAD_PROBE_URL', 'http://127.0.0.1:5000/ready')
+PROBE_INTERVAL = float(os.environ.get('RELOAD_PROBE_INTERVAL', '0.5'))
+
 
 def run_command(cmd):
     try:
@@ -41,6 +68,210 @@ def run_command(cmd):
         return False
 
 
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def worker_pids(master):
+    """Current gunicorn worker pids (children of the master process)."""
+    r = subprocess.run(['pgrep', '-P', str(master)], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    return {int(p) for p in r.stdout.split()}
+
+
+def worker_state(pid):
+    try:
+        with (WORKER_STATE_DIR / f'worker-{pid}.json').open('r', encoding='utf8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+class Prober:
+    """Polls PROBE_URL during a reload and counts requests that did not succeed."""
+
+    def __init__(self, url, interval):
+        self.url = url
+        self.interval = interval
+        self.sent = 0
+        self.failed = 0
+        self.errors = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sent += 1
+            try:
+                with urllib.request.urlopen(self.url, timeout=5) as resp:
+                    resp.read()
+            except urllib.error.HTTPError as e:
+                self._fail(f'HTTP {e.code}')
+            except Exception as e:
+                self._fail(str(e))
+            self._stop.wait(self.interval)
+
+    def _fail(self, reason):
+        self.failed += 1
+        if len(self.errors) < 20:
+            self.errors.append({'ts': time.time(), 'error': reason})
+
+    def start(self):
+        if self.url:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        return {'url': self.url, 'sent': self.sent, 'failed': self.failed, 'errors': self.errors}
+
+
+def wait_until(predicate, timeout, interval=0.5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = predicate()
+        if result:
+            return result
+        time.sleep(interval)
+    return None
+
+
+def rolling_reload():
+    """Replace the bot's gunicorn workers one at a time without dropping requests.
+
+    For every worker running when the reload starts: TTIN asks the master for
+    one extra worker, which imports the current code and FAQ files; once its
+    state file reports ready, TTOU makes the master gracefully stop its oldest
+    worker (an old one), which finishes its in-flight request before exiting.
+    Capacity never drops below the original worker count. A replacement that
+    is not ready within READY_TIMEOUT is rolled back with TTOU as well: the
+    nworkers_changed hook in python-bot/gunicorn.conf.py makes gunicorn stop
+    unready workers before ready ones, so the old workers keep serving and
+    the reload ends with an error.
+    """
+    started = time.monotonic()
+    record = {'mode': 'rolling', 'ok': False, 'steps': []}
+    try:
+        master = int(GUNICORN_PID_FILE.read_text().strip())
+    except (OSError, ValueError) as e:
+        record['error'] = f'cannot read gunicorn pid file {GUNICORN_PID_FILE}: {e}'
+        return record
+    if not pid_alive(master):
+        record['error'] = f'gunicorn master {master} is not running'
+        return record
+
+    old = worker_pids(master)
+    record['master'] = master
+    record['old_workers'] = sorted(old)
+    if old and not any(worker_state(pid) for pid in old):
+        # wrong WORKER_STATE_DIR: a replacement could never be seen as ready
+        record['error'] = f'no worker state files for {sorted(old)} in {WORKER_STATE_DIR}; check WORKER_STATE_DIR'
+        return record
+    prober = Prober(PROBE_URL, PROBE_INTERVAL).start()
+    try:
+        for _ in sorted(old):
+            step = {}
+            step_started = time.monotonic()
+            before = worker_pids(master)
+            print('Starting replacement worker')
+            os.kill(master, signal.SIGTTIN)
+
+            def new_ready():
+                for pid in worker_pids(master) - before:
+                    state = worker_state(pid)
+                    if state and state.get('ready'):
+                        return pid
+                return None
+
+            new_pid = wait_until(new_ready, READY_TIMEOUT)
+            if new_pid is None:
+                # put the worker count back; the bot's gunicorn.conf.py hook
+                # makes gunicorn stop the unready replacement, not an old worker
+                started_since = worker_pids(master) - before
+                os.kill(master, signal.SIGTTOU)
+                wait_until(lambda: not (started_since & worker_pids(master)) or None, DRAIN_TIMEOUT)
+                current = worker_pids(master)
+                step['rolled_back_workers'] = sorted(started_since - current)
+                step['retired_worker'] = sorted(old - current)
+                record['steps'].append(step)
+                record['error'] = f'replacement worker not ready after {READY_TIMEOUT:.0f}s'
+                if step['retired_worker']:
+                    record['error'] += ('; gunicorn stopped an old worker instead of the replacement'
+                                        ' (is python-bot/gunicorn.conf.py loaded?)')
+                print(f"Replacement not ready; stopped {step['rolled_back_workers']}")
+                break
+            step['new_worker'] = new_pid
+            step['ready_after'] = round(time.monotonic() - step_started, 3)
+
+            remaining = old & worker_pids(master)
+            print(f'Worker {new_pid} ready; retiring one of {sorted(remaining)}')
+            os.kill(master, signal.SIGTTOU)
+            drained = wait_until(lambda: old & worker_pids(master) < remaining or None, DRAIN_TIMEOUT)
+            step['retired_worker'] = sorted(remaining - (old & worker_pids(master)))
+            step['drained_after'] = round(time.monotonic() - step_started, 3)
+            record['steps'].append(step)
+            if drained is None:
+                record['error'] = f'old worker still running after {DRAIN_TIMEOUT:.0f}s'
+                break
+        else:
+            record['ok'] = True
+    finally:
+        record['probe'] = prober.stop()
+        record['failed_requests'] = record['probe']['failed']
+        record['duration'] = round(time.monotonic() - started, 3)
+        record['workers'] = sorted(worker_pids(master))
+    return record
+
+
+def restart_command(target):
+    """RESTART_COMMAND with {target} substituted"""
+    # Sanitize RESTART_COMMAND: some shells (PowerShell) may pass
+    # strings with escaped quotes or backslashes (e.g. \"). Normalize
+    # common escape sequences so the command we run is valid.
+    rc = RESTART_COMMAND
+    # If someone included literal surrounding quotes, strip them
+    if rc.startswith('"') and rc.endswith('"'):
+        rc = rc[1:-1]
+    # Replace escaped quotes \" with " and double backslashes with single
+    rc = rc.replace('\\"', '"').replace('\\\\', '\\')
+    # Also replace single-escaped backslashes commonly produced by some shells
+    rc = rc.replace('\\', '\\')
+    cmd = rc
+    # Allow the command to include a {target} placeholder which will be
+    # substituted with the entry target. Example:
+    # RESTART_COMMAND='supervisorctl restart {target}'
+    cmd = RESTART_COMMAND
+    try:
+        # Safely format the command with the target field. Use get()
+        # to avoid KeyError for missing fields.
+        if target:
+            try:
+                cmd = rc.format(target=target)
+            except Exception:
+                # fallback to naive replacement
+                cmd = rc.replace('{target}', str(target))
+    except Exception as e:
+        print('Failed to format RESTART_COMMAND with target, using raw command', e)
+        cmd = RESTART_COMMAND
+    return cmd
+
+
+def split_targets(target):
+    """Targets to handle for a request: in rolling mode "all" becomes each
+    program of ALL_TARGETS, so the bot is reloaded without downtime."""
+    if RELOAD_MODE == 'rolling' and target == 'all' and any(t in ROLLING_TARGETS for t in ALL_TARGETS):
+        return ALL_TARGETS
+    return [target]
+
+
 def process_new_lines():
     if not REQUESTS.exists():
         return
@@ -56,45 +287,31 @@ def process_new_lines():
             print('Invalid json line, skipping', e)
             continue
         print('Processing restart request:', entry)
-        if RESTART_COMMAND:
-            # Sanitize RESTART_COMMAND: some shells (PowerShell) may pass
-            # strings with escaped quotes or backslashes (e.g. \"). Normalize
-            # common escape sequences so the command we run is valid.
-            rc = RESTART_COMMAND
-            # If someone included literal surrounding quotes, strip them
-            if rc.startswith('"') and rc.endswith('"'):
-                rc = rc[1:-1]
-            # Replace escaped quotes \" with " and double backslashes with single
-            rc = rc.replace('\\"', '"').replace('\\\\', '\\')
-            # Also replace single-escaped backslashes commonly produced by some shells
-            rc = rc.replace('\\', '\\')
-            cmd = rc
-            # Allow the command to include a {target} placeholder which will be
-            # substituted with the entry target. Example:
-            # RESTART_COMMAND='supervisorctl restart {target}'
-            cmd = RESTART_COMMAND
-            try:
-                # Safely format the command with the target field. Use get()
-                # to avoid KeyError for missing fields.
-                target = entry.get('target') if isinstance(entry, dict) else None
-                if target:
-                    try:
-                        cmd = rc.format(target=target)
-                    except Exception:
-                        # fallback to naive replacement
-                        cmd = rc.replace('{target}', str(target))
-            except Exception as e:
-                print('Failed to format RESTART_COMMAND with target, using raw command', e)
-                cmd = RESTART_COMMAND
-
-            ok = run_command(cmd)
-            # write processed record
-            with PROCESSED.open('a', encoding='utf8') as pf:
-                pf.write(json.dumps({'entry': entry, 'command': cmd, 'ok': ok, 'ts': time.time()}) + "\n")
-        else:
-            print('No RESTART_COMMAND set; skipping actual restart step')
-            with PROCESSED.open('a', encoding='utf8') as pf:
-                pf.write(json.dumps({'entry': entry, 'command': None, 'ok': False, 'ts': time.time()}) + "\n")
+        target = entry.get('target') if isinstance(entry, dict) else None
+        targets = split_targets(target)
+        for target in targets:
+            if RELOAD_MODE == 'rolling' and target in ROLLING_TARGETS:
+                result = rolling_reload()
+                print('Rolling reload finished:', result)
+                with PROCESSED.open('a', encoding='utf8') as pf:
+                    pf.write(json.dumps({'entry': entry, 'target': target, 'command': None, **result, 'ts': time.time()}) + "\n")
+            elif RESTART_COMMAND and len(targets) > 1 and '{target}' not in RESTART_COMMAND:
+                # one command for everything would restart the bot again
+                error = f'RESTART_COMMAND has no {{target}} placeholder; not restarting {target}'
+                print(error)
+                with PROCESSED.open('a', encoding='utf8') as pf:
+                    pf.write(json.dumps({'entry': entry, 'target': target, 'command': None, 'ok': False,
+                                         'error': error, 'ts': time.time()}) + "\n")
+            elif RESTART_COMMAND:
+                cmd = restart_command(target)
+                ok = run_command(cmd)
+                # write processed record
+                with PROCESSED.open('a', encoding='utf8') as pf:
+                    pf.write(json.dumps({'entry': entry, 'target': target, 'command': cmd, 'ok': ok, 'ts': time.time()}) + "\n")
+            else:
+                print('No RESTART_COMMAND set; skipping actual restart step')
+                with PROCESSED.open('a', encoding='utf8') as pf:
+                    pf.write(json.dumps({'entry': entry, 'target': target, 'command': None, 'ok': False, 'ts': time.time()}) + "\n")
     # After processing, rotate requests file
     try:
         if REQUESTS.exists():
@@ -0,0 +1,246 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is refused by admission control.
+
+    status is the HTTP status to answer with (429 for rate limits, 503 when
+    the server is saturated) and retry_after the suggested wait in seconds.
+    """
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `burst` stored."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_acquire(self, now=None):
+        """Take one token. Returns (ok, seconds until a token is available)."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True, 0.0
+        if self.rate <= 0:
+            return False, 60.0
+        return False, (1.0 - self.tokens) / self.rate
+
+
+class _Slot:
+    """Context manager holding one concurrency slot until the request ends."""
+
+    def __init__(self, controller):
+        self._controller = controller
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._controller._release()
+        return False
+
+
+class AdmissionController:
+    """In-process admission control for the /ask endpoint.
+
+    Requests pass three gates in order: a per-client token bucket, a
+    per-environment token bucket (check()) and a global concurrency limit
+    (slot()). When all slots are busy a request may wait in a short bounded
+    queue; if the queue is full or the wait times out it is rejected
+    immediately rather than piling up behind the workers. admit() runs both;
+    app.py calls them separately so requests that share an in-flight
+    single-flight computation pay the rate limits but take no slot.
+
+    Limits can be overridden per environment with `env_limits`, a mapping of
+    env name to any of `rate`, `burst`, `ip_rate` and `ip_burst`. `env` must
+    already be canonical (a known environment name): buckets are created per
+    distinct value and never expire.
+
+    State is per process. The concurrency cap and queue only matter when a
+    worker serves several requests at once: gunicorn gthread workers need
+    more threads than max_concurrent + max_queue, or excess requests wait in
+    gunicorn's unbounded backlog instead of this queue (gunicorn.conf.py warns).
+    The token buckets of each worker are independent, so the effective rates
+    are the configured ones times the number of workers. `client` is the
+    address the WSGI server reports; behind a proxy that is the proxy unless
+    app.py trusts X-Forwarded-For (TRUSTED_PROXIES).
+    """
+
+    def __init__(self, ip_rate=2.0, ip_burst=10, env_rate=20.0, env_burst=40,
+                 max_concurrent=4, max_queue=8, queue_timeout=2.0,
+                 env_limits=None, max_clients=10000, enabled=True):
+        self.enabled = bool(enabled)
+        self.ip_rate = float(ip_rate)
+        self.ip_burst = float(ip_burst)
+        self.env_rate = float(env_rate)
+        self.env_burst = float(env_burst)
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = float(queue_timeout)
+        self.env_limits = {k.lower(): v for k, v in (env_limits or {}).items()}
+        self.max_clients = int(max_clients)
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._ip_buckets = OrderedDict()
+        self._env_buckets = {}
+        self._active = 0
+        self._waiting = 0
+
+        self.counters = {
+            'admitted': 0,
+            'queued': 0,
+            'rejected_ip': 0,
+            'rejected_env': 0,
+            'rejected_overload': 0,
+            'queue_timeouts': 0
+        }
+
+    @classmethod
+    def from_env(cls):
+        """Build a controller from ADMISSION_* environment variables."""
+        env_limits = {}
+        raw = os.environ.get('ADMISSION_ENV_LIMITS')
+        if raw:
+            try:
+                env_limits = json.loads(raw)
+            except Exception as e:
+                print(f"Warning: invalid ADMISSION_ENV_LIMITS, ignoring: {e}")
+        return cls(
+            ip_rate=float(os.environ.get('ADMISSION_IP_RATE', '2')),
+            ip_burst=float(os.environ.get('ADMISSION_IP_BURST', '10')),
+            env_rate=float(os.environ.get('ADMISSION_ENV_RATE', '20')),
+            env_burst=float(os.environ.get('ADMISSION_ENV_BURST', '40')),
+            max_concurrent=int(os.environ.get('ADMISSION_MAX_CONCURRENT', '4')),
+            max_queue=int(os.environ.get('ADMISSION_MAX_QUEUE', '8')),
+            queue_timeout=float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '2')),
+            env_limits=env_limits,
+            enabled=os.environ.get('ADMISSION_ENABLED', '1').lower() not in ('0', 'false', 'no')
+        )
+
+    def _limit(self, env, name, default):
+        override = self.env_limits.get(env) or {}
+        return float(override.get(name, default))
+
+    def _ip_bucket(self, env, client):
+        key = (env, client)
+        bucket = self._ip_buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self._limit(env, 'ip_rate', self.ip_rate),
+                                 self._limit(env, 'ip_burst', self.ip_burst))
+            self._ip_buckets[key] = bucket
+            # bound memory: forget the least recently seen clients
+            while len(self._ip_buckets) > self.max_clients:
+                self._ip_buckets.popitem(last=False)
+        else:
+            self._ip_buckets.move_to_end(key)
+        return bucket
+
+    def _env_bucket(self, env):
+        bucket = self._env_buckets.get(env)
+        if bucket is None:
+            bucket = TokenBucket(self._limit(env, 'rate', self.env_rate),
+                                 self._limit(env, 'burst', self.env_burst))
+            self._env_buckets[env] = bucket
+        return bucket
+
+    def admit(self, client, env):
+        """Admit a request or raise AdmissionRejected.
+
+        Returns a context manager that must wrap the request's work so the
+        concurrency slot is released when it finishes.
+        """
+        self.check(client, env)
+        return self.slot()
+
+    def check(self, client, env):
+        """Take a token from the client's and the environment's bucket, or
+        raise AdmissionRejected (429)."""
+        if not self.enabled:
+            return
+        env = (env or '').lower()
+        client = client or 'unknown'
+        with self._lock:
+            now = time.monotonic()
+            ok, wait = self._ip_bucket(env, client).try_acquire(now)
+            if not ok:
+                self.counters['rejected_ip'] += 1
+                raise AdmissionRejected(429, 'client rate limit exceeded', wait)
+            ok, wait = self._env_bucket(env).try_acquire(now)
+            if not ok:
+                self.counters['rejected_env'] += 1
+                raise AdmissionRejected(429, 'environment rate limit exceeded', wait)
+
+    def slot(self):
+        """Take a concurrency slot, waiting in the bounded queue if needed, or
+        raise AdmissionRejected (503).
+
+        Returns a context manager that releases the slot on exit.
+        """
+        if not self.enabled:
+            return _Slot(self)
+        with self._cond:
+            now = time.monotonic()
+            if self._active >= self.max_concurrent:
+                if self._waiting >= self.max_queue:
+                    self.counters['rejected_overload'] += 1
+                    raise AdmissionRejected(503, 'server busy', self.queue_timeout)
+                self.counters['queued'] += 1
+                self._waiting += 1
+                deadline = now + self.queue_timeout
+                try:
+                    while self._active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.counters['queue_timeouts'] += 1
+                            self.counters['rejected_overload'] += 1
+                            raise AdmissionRejected(503, 'server busy', self.queue_timeout)
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._active += 1
+            self.counters['admitted'] += 1
+        return _Slot(self)
+
+    def _release(self):
+        if not self.enabled:
+            return
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        """Return admission counters and current occupancy."""
+        with self._lock:
+            data = dict(self.counters)
+            data.update({
+                'enabled': self.enabled,
+                'active': self._active,
+                'waiting': self._waiting,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'tracked_clients': len(self._ip_buckets)
+            })
+        return data
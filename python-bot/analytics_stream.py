@@ -0,0 +1,414 @@
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+from suggest_index import normalize_text
+
+CONFIDENCE_BINS = 10
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter sketch: top questions in O(capacity) memory.
+
+    Counts are upper bounds; `error` is how much of a count may belong to
+    items evicted earlier.
+    """
+
+    def __init__(self, capacity=50):
+        self.capacity = int(capacity)
+        self.counts = {}
+        self.errors = {}
+        self.examples = {}
+
+    def add(self, key, example=None):
+        if key in self.counts:
+            self.counts[key] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = 1
+            self.errors[key] = 0
+            self.examples[key] = example
+        else:
+            victim = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(victim)
+            self.errors.pop(victim, None)
+            self.examples.pop(victim, None)
+            self.counts[key] = floor + 1
+            self.errors[key] = floor
+            self.examples[key] = example
+
+    def top(self, n=10):
+        items = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [{'question': self.examples.get(k) or k, 'count': c, 'error': self.errors.get(k, 0)}
+                for k, c in items]
+
+
+class Bucket:
+    """Aggregates for one environment over one time window."""
+
+    def __init__(self, start, heavy_hitters=50, samples=20):
+        self.start = start
+        self.total = 0
+        self.questions = SpaceSaving(heavy_hitters)
+        self.categories = Counter()
+        self.statuses = Counter()
+        self.confidence = [0] * CONFIDENCE_BINS
+        self.confidence_sum = 0.0
+        self.not_found_seen = 0
+        self.not_found = []
+        self.sample_size = int(samples)
+        self.answered = Counter()
+        self.flushed = False
+
+    def add(self, question, response):
+        self.total += 1
+        self.questions.add(normalize_text(question), question.strip())
+        self.categories[response.get('category') or 'unknown'] += 1
+        status = response.get('status') or 'unknown'
+        self.statuses[status] += 1
+        try:
+            conf = min(max(float(response.get('confidence', 0.0)), 0.0), 1.0)
+        except (TypeError, ValueError):
+            conf = 0.0
+        self.confidence[min(int(conf * CONFIDENCE_BINS), CONFIDENCE_BINS - 1)] += 1
+        self.confidence_sum += conf
+        if status == 'found' and response.get('faq_id') is not None:
+            # a cross-env search may answer from another env's FAQs
+            self.answered[(response.get('source_env'), str(response['faq_id']))] += 1
+        if status == 'not_found':
+            # reservoir sample, so every unanswered question has the same chance
+            self.not_found_seen += 1
+            if len(self.not_found) < self.sample_size:
+                self.not_found.append(question)
+            else:
+                j = random.randrange(self.not_found_seen)
+                if j < self.sample_size:
+                    self.not_found[j] = question
+
+    def summary(self, env, width, top=10):
+        answered = {}
+        for (source_env, faq_id), count in self.answered.items():
+            answered.setdefault(source_env or env, {})[faq_id] = count
+        return {
+            'env': env,
+            'bucket_start': int(self.start),
+            'bucket_seconds': width,
+            'total': self.total,
+            'top_questions': self.questions.top(top),
+            'categories': dict(self.categories),
+            'statuses': dict(self.statuses),
+            'confidence_histogram': list(self.confidence),
+            'average_confidence': round(self.confidence_sum / self.total, 4) if self.total else 0.0,
+            'not_found_count': self.not_found_seen,
+            'not_found_samples': list(self.not_found),
+            'answered_faqs': answered
+        }
+
+
+class AnalyticsAggregator:
+    """Rolling in-memory analytics per environment and time bucket.
+
+    /ask feeds every answered question in; completed buckets are periodically
+    appended to a JSON Lines file as compact summaries and the most recent
+    ones stay queryable, so dashboards can read pre-aggregated data instead
+    of scanning chat logs.
+
+    Each gunicorn worker aggregates only the requests it served. With
+    `snapshot_dir` set, every worker also rewrites `analytics-<pid>.json`
+    there on each flush, and query() merges the snapshots of the other live
+    workers into its own buckets. faq_hits() also reads back what was flushed
+    to `flush_path`, so its counts outlive the workers that recorded them.
+    """
+
+    def __init__(self, bucket_seconds=3600, keep_buckets=48, flush_path=None,
+                 heavy_hitters=50, samples=20, snapshot_dir=None):
+        self.bucket_seconds = int(bucket_seconds)
+        self.keep_buckets = int(keep_buckets)
+        self.flush_path = flush_path
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_interval = None
+        self.pid = os.getpid()
+        self.heavy_hitters = int(heavy_hitters)
+        self.samples = int(samples)
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._flusher = None
+        self.flushed_summaries = 0
+        # (env, bucket_start, pid) -> answered_faqs of summaries in flush_path
+        self._flushed = {}
+        self._flushed_offset = 0
+        self._flushed_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build an aggregator from ANALYTICS_* environment variables."""
+        base = os.path.dirname(os.path.abspath(__file__))
+        return cls(
+            bucket_seconds=int(os.environ.get('ANALYTICS_BUCKET_SECONDS', '3600')),
+            keep_buckets=int(os.environ.get('ANALYTICS_KEEP_BUCKETS', '48')),
+            flush_path=os.environ.get('ANALYTICS_FLUSH_PATH', os.path.join(base, 'analytics_summary.jsonl')) or None,
+            snapshot_dir=os.environ.get('ANALYTICS_SNAPSHOT_DIR', os.path.join(base, 'run')) or None
+        )
+
+    def _bucket_start(self, ts):
+        return ts - (ts % self.bucket_seconds)
+
+    def record(self, env, question, response, ts=None):
+        """Add one answered question to the current bucket of its environment.
+
+        `env` should be a known environment name; buckets are kept per value.
+        """
+        ts = time.time() if ts is None else ts
+        start = self._bucket_start(int(ts))
+        with self._lock:
+            key = (env, start)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = Bucket(start, self.heavy_hitters, self.samples)
+                self._buckets[key] = bucket
+                self._evict(env)
+            bucket.add(question, response)
+
+    def _evict(self, env):
+        starts = sorted(s for e, s in self._buckets if e == env)
+        for start in starts[:-self.keep_buckets]:
+            self._buckets.pop((env, start), None)
+
+    def _summaries(self, top):
+        with self._lock:
+            return [b.summary(env, self.bucket_seconds, top) for (env, _), b in self._buckets.items()]
+
+    def query(self, env=None, buckets=24, top=10):
+        """Summaries of the latest buckets, newest first, plus a merged total.
+
+        Buckets of other workers (from their snapshots) are merged into the
+        bucket with the same env and start; `workers` lists the pids included.
+        """
+        grouped = {}
+        workers = [self.pid]
+        for pid, summaries in [(self.pid, self._summaries(self.heavy_hitters))] + self._peer_snapshots():
+            if pid != self.pid:
+                workers.append(pid)
+            for s in summaries:
+                if env is None or s['env'] == env:
+                    grouped.setdefault((s['env'], s['bucket_start']), []).append(s)
+        keys = sorted(grouped, key=lambda k: k[1], reverse=True)[:buckets]
+        summaries = [self._merge_bucket(grouped[k], top) for k in keys]
+        return {'buckets': summaries, 'totals': self._merge(summaries, top), 'workers': sorted(workers)}
+
+    def _merge_bucket(self, parts, top):
+        """One summary for the same env/bucket reported by several workers."""
+        merged = dict(parts[0])
+        if len(parts) > 1:
+            totals = self._merge(parts, top)
+            confidence_sum = sum(p['average_confidence'] * p['total'] for p in parts)
+            samples = [q for p in parts for q in p['not_found_samples']]
+            errors = Counter()
+            for p in parts:
+                for q in p['top_questions']:
+                    errors[normalize_text(q['question'])] += q.get('error', 0)
+            merged.update({
+                'total': totals['total'],
+                'categories': totals['categories'],
+                'statuses': totals['statuses'],
+                'confidence_histogram': totals['confidence_histogram'],
+                'average_confidence': round(confidence_sum / totals['total'], 4) if totals['total'] else 0.0,
+                'not_found_count': totals['not_found_count'],
+                'not_found_samples': samples[:self.samples],
+                'answered_faqs': totals['answered_faqs'],
+                'top_questions': [dict(q, error=errors[normalize_text(q['question'])])
+                                  for q in totals['top_questions']]
+            })
+        merged['top_questions'] = merged['top_questions'][:top]
+        return merged
+
+    def faq_hits(self):
+        """How often each FAQ was answered over the kept buckets, as
+        {env: Counter(str(faq_id) -> count)} keyed by the env the FAQ is in.
+
+        Counts cover every worker: summaries flushed to flush_path (also by
+        workers that have since exited), the snapshots of live workers and
+        this worker's own buckets, so workers see the same numbers and they
+        survive restarts.
+        """
+        cutoff = self._bucket_start(int(time.time())) - (self.keep_buckets - 1) * self.bucket_seconds
+        with self._flushed_lock:
+            self._read_flushed(cutoff)
+            parts = dict(self._flushed)
+        for pid, summaries in [(self.pid, self._summaries(0))] + self._peer_snapshots():
+            for s in summaries:
+                parts[(s['env'], s['bucket_start'], pid)] = s.get('answered_faqs') or {}
+        hits = {}
+        for (_, start, _), answered in parts.items():
+            if start < cutoff:
+                continue
+            for env, counts in answered.items():
+                hits.setdefault(env, Counter()).update(counts)
+        return hits
+
+    def _read_flushed(self, cutoff):
+        """Add summaries appended to flush_path since the last call; the
+        last line per (env, bucket_start, pid) wins, as for other readers."""
+        if not self.flush_path:
+            return
+        try:
+            with open(self.flush_path, 'rb') as fh:
+                if os.fstat(fh.fileno()).st_size < self._flushed_offset:
+                    # truncated or rotated: start over
+                    self._flushed_offset = 0
+                    self._flushed.clear()
+                fh.seek(self._flushed_offset)
+                for line in fh:
+                    if not line.endswith(b'\n'):
+                        break  # still being appended
+                    self._flushed_offset += len(line)
+                    try:
+                        s = json.loads(line)
+                        if s['bucket_start'] >= cutoff:
+                            self._flushed[(s['env'], s['bucket_start'], s.get('pid'))] = s.get('answered_faqs') or {}
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError:
+            return
+        for key in [k for k in self._flushed if k[1] < cutoff]:
+            del self._flushed[key]
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.snapshot_dir, f"analytics-{pid}.json")
+
+    def write_snapshot(self):
+        """Publish this worker's in-memory buckets for the other workers."""
+        if not self.snapshot_dir:
+            return
+        path = self._snapshot_path(self.pid)
+        tmp = f"{path}.tmp"
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                json.dump({'pid': self.pid, 'updated_at': time.time(),
+                           'buckets': self._summaries(self.heavy_hitters)}, fh, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Warning: could not write analytics snapshot {path}: {e}")
+
+    def remove_snapshot(self):
+        if self.snapshot_dir:
+            try:
+                os.remove(self._snapshot_path(self.pid))
+            except OSError:
+                pass
+
+    def _peer_snapshots(self):
+        """(pid, summaries) from recent snapshots of the other workers.
+
+        A worker removes its snapshot when it exits; one that was not
+        rewritten for two flush intervals belongs to a dead worker.
+        """
+        if not self.snapshot_dir or not self.snapshot_interval:
+            return []
+        cutoff = time.time() - 2 * self.snapshot_interval
+        try:
+            names = os.listdir(self.snapshot_dir)
+        except OSError:
+            return []
+        peers = []
+        for name in names:
+            if not (name.startswith('analytics-') and name.endswith('.json')):
+                continue
+            try:
+                pid = int(name[len('analytics-'):-len('.json')])
+            except ValueError:
+                continue
+            if pid == self.pid:
+                continue
+            try:
+                with open(os.path.join(self.snapshot_dir, name), 'r', encoding='utf-8') as fh:
+                    snapshot = json.load(fh)
+                if snapshot['updated_at'] >= cutoff:
+                    peers.append((pid, snapshot['buckets']))
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+        return peers
+
+    @staticmethod
+    def _merge(summaries, top):
+        totals = {
+            'total': 0,
+            'categories': Counter(),
+            'statuses': Counter(),
+            'confidence_histogram': [0] * CONFIDENCE_BINS,
+            'not_found_count': 0
+        }
+        questions = Counter()
+        answered = {}
+        examples = {}
+        for s in summaries:
+            totals['total'] += s['total']
+            totals['categories'].update(s['categories'])
+            totals['statuses'].update(s['statuses'])
+            totals['not_found_count'] += s['not_found_count']
+            for i, n in enumerate(s['confidence_histogram']):
+                totals['confidence_histogram'][i] += n
+            for q in s['top_questions']:
+                key = normalize_text(q['question'])
+                questions[key] += q['count']
+                examples.setdefault(key, q['question'])
+            for env, counts in s.get('answered_faqs', {}).items():
+                answered.setdefault(env, Counter()).update(counts)
+        totals['categories'] = dict(totals['categories'])
+        totals['answered_faqs'] = {env: dict(counts) for env, counts in answered.items()}
+        totals['statuses'] = dict(totals['statuses'])
+        totals['top_questions'] = [{'question': examples[k], 'count': c} for k, c in questions.most_common(top)]
+        return totals
+
+    def flush(self, include_current=False):
+        """Append summaries of completed, not yet flushed buckets to flush_path.
+
+        include_current also writes the running bucket as a partial snapshot;
+        its complete summary is written again once the bucket closes, so
+        readers keep the last line per (env, bucket_start, pid).
+        """
+        if not self.flush_path:
+            return 0
+        current = self._bucket_start(int(time.time()))
+        with self._lock:
+            ready = [(k, b) for k, b in self._buckets.items()
+                     if not b.flushed and (include_current or k[1] < current)]
+            lines = []
+            for (env, _), bucket in ready:
+                summary = bucket.summary(env, self.bucket_seconds)
+                summary['pid'] = os.getpid()
+                lines.append(json.dumps(summary, ensure_ascii=False))
+                if bucket.start < current:
+                    bucket.flushed = True
+        if lines:
+            with open(self.flush_path, 'a', encoding='utf-8') as fh:
+                fh.write("\n".join(lines) + "\n")
+            self.flushed_summaries += len(lines)
+        return len(lines)
+
+    def start_flusher(self, interval, on_flush=None):
+        """Flush completed buckets and rewrite the worker snapshot every
+        `interval` seconds in a daemon thread, then call on_flush()."""
+        if self._flusher is not None or not (self.flush_path or self.snapshot_dir) or interval <= 0:
+            return
+        if self.snapshot_dir:
+            self.snapshot_interval = float(interval)
+            atexit.register(self.remove_snapshot)
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                    self.write_snapshot()
+                    if on_flush is not None:
+                        on_flush()
+                except Exception as e:
+                    print(f"Warning: analytics flush failed: {e}")
+
+        self._flusher = threading.Thread(target=run, name='analytics-flush', daemon=True)
+        self._flusher.start()
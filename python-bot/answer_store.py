@@ -0,0 +1,174 @@
+import json
+import mmap
+import os
+import threading
+from array import array
+
+# FAQ fields only needed to build a response; everything else (id, category,
+# questions, keywords) stays in RAM for matching.
+BODY_FIELDS = ('answer', 'links')
+
+# Derived from the body but needed at startup (link texts are category
+# keywords), so it is kept in the meta record and bodies need not be read.
+LINK_TEXTS = '_link_texts'
+
+STORE_VERSION = 2
+
+
+def split_faq(faq):
+    """Split an FAQ dict into (meta, body) by BODY_FIELDS."""
+    meta = {k: v for k, v in faq.items() if k not in BODY_FIELDS}
+    body = {k: faq[k] for k in BODY_FIELDS if k in faq}
+    links = body.get('links') or []
+    link_texts = [l.get('text', '').lower() for l in links if isinstance(l, dict) and l.get('text')]
+    if link_texts:
+        meta[LINK_TEXTS] = link_texts
+    return meta, body
+
+
+def _signature(path):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+class MemoryAnswerStore:
+    """Answer bodies kept as plain dicts, for small FAQ files."""
+
+    backend = 'memory'
+
+    def __init__(self, bodies):
+        self._bodies = bodies
+
+    def __len__(self):
+        return len(self._bodies)
+
+    def get(self, index):
+        return self._bodies[index]
+
+    def stats(self):
+        return {'backend': self.backend, 'entries': len(self._bodies)}
+
+    def close(self):
+        pass
+
+
+class MappedAnswerStore:
+    """Answer bodies in an offset-indexed file read through mmap.
+
+    The body file is the JSON encoding of every FAQ body back to back;
+    `offsets`/`lengths` (compact arrays) locate body i. Nothing is decoded
+    until get() is called, and the pages belong to the OS page cache rather
+    than the worker heap, so they are shared between gunicorn workers.
+    """
+
+    backend = 'mmap'
+
+    def __init__(self, path, offsets, lengths):
+        self.path = path
+        self.offsets = offsets
+        self.lengths = lengths
+        self.reads = 0
+        self._fh = open(path, 'rb')
+        self.size = os.fstat(self._fh.fileno()).st_size
+        self._map = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, index):
+        start = self.offsets[index]
+        raw = self._map[start:start + self.lengths[index]]
+        with self._lock:
+            self.reads += 1
+        return json.loads(raw)
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'entries': len(self.offsets),
+            'file': os.path.basename(self.path),
+            'file_bytes': self.size,
+            'reads': self.reads
+        }
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._fh.close()
+
+
+def _paths(store_dir, faq_path):
+    stem = os.path.splitext(os.path.basename(faq_path))[0]
+    return os.path.join(store_dir, f"{stem}.index.json"), stem
+
+
+def open_store(store_dir, faq_path):
+    """Open the store for faq_path if it was built from the current file.
+
+    Returns (metas, store) or None when missing, stale or unreadable.
+    """
+    index_path, _ = _paths(store_dir, faq_path)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as fh:
+            index = json.load(fh)
+        if index.get('version') != STORE_VERSION or index.get('source') != _signature(faq_path):
+            return None
+        store = MappedAnswerStore(
+            os.path.join(store_dir, index['bodies']),
+            array('Q', index['offsets']),
+            array('L', index['lengths'])
+        )
+        return index['faqs'], store
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def build_store(store_dir, faq_path, faqs):
+    """Write the body file and index for `faqs`, then open them.
+
+    Files are written under temporary names and renamed into place, and the
+    body file name carries the source signature, so workers building or
+    reading the same store concurrently never see a half-written pair.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    index_path, stem = _paths(store_dir, faq_path)
+    source = _signature(faq_path)
+    bodies_name = f"{stem}-{source['size']}-{source['mtime_ns']}.bodies"
+    bodies_path = os.path.join(store_dir, bodies_name)
+
+    metas, offsets, lengths = [], array('Q'), array('L')
+    tmp = f"{bodies_path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as fh:
+        for faq in faqs:
+            meta, body = split_faq(faq)
+            raw = json.dumps(body, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            offsets.append(fh.tell())
+            lengths.append(len(raw))
+            fh.write(raw)
+            metas.append(meta)
+    os.replace(tmp, bodies_path)
+
+    index = {
+        'version': STORE_VERSION,
+        'source': source,
+        'bodies': bodies_name,
+        'offsets': offsets.tolist(),
+        'lengths': lengths.tolist(),
+        'faqs': metas
+    }
+    tmp = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(index, fh, ensure_ascii=False)
+    os.replace(tmp, index_path)
+
+    # drop body files of earlier builds; a worker still mapping one keeps
+    # its pages (on Windows the file stays until the next rebuild)
+    for name in os.listdir(store_dir):
+        if name.startswith(f"{stem}-") and name.endswith('.bodies') and name != bodies_name:
+            try:
+                os.remove(os.path.join(store_dir, name))
+            except OSError:
+                pass
+
+    return metas, MappedAnswerStore(bodies_path, offsets, lengths)
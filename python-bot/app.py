@@ -1,11 +1,25 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import logging
 import requests
 import uuid
 import os
+import threading
+import time
 from datetime import datetime
-from nlp_processor import NLPProcessor
+from nlp_processor import NLPProcessor, in_use
+from single_flight import SingleFlight
+from admission import AdmissionController, AdmissionRejected
+from payloads import PrerenderedResponse
+from fanout import FanOutSearcher
+from analytics_stream import AnalyticsAggregator
+from sampling_profiler import SamplingProfiler
+from shadow import ShadowScorer
+from worker_state import WorkerState
+from ingest import IngestProgress
+import startup_profile
+import warmup
 
 
 app = Flask(__name__)
@@ -26,8 +40,18 @@ if single_origin == '*' or not single_origin:
 # Apply CORS with the single origin
 CORS(app, resources={r"/*": {"origins": single_origin}})
 
+# Behind a reverse proxy (nginx) request.remote_addr is the proxy, so every
+# client would share one admission bucket. TRUSTED_PROXIES=<n> takes the
+# client address from X-Forwarded-For as set by the n proxies in front.
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', '0'))
+if TRUSTED_PROXIES > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
 # Admin backend configuration
 ADMIN_BACKEND_URL = "http://localhost:3001"
+# ADMIN_LOG_ENABLED=0 stops /ask from writing chat logs to the admin backend
+# (for load tests and traffic replay against a bot sharing its database)
+ADMIN_LOG_ENABLED = os.environ.get('ADMIN_LOG_ENABLED', '1').lower() not in ('0', 'false', 'no')
 
 # Configure logging: prefer stdout so container runtime captures logs.
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
@@ -52,16 +76,33 @@ root_logger.addHandler(file_handler)
 
 logger = logging.getLogger(__name__)
 
-try:
-    logger.info("Starting NLP Processor initialization...")
-    nlp_processor = NLPProcessor()
-    logger.info("NLP Processor initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize NLP Processor: {e}")
-    nlp_processor = None
+# One prepared NLPProcessor per FAQ file, so environments never have to
+# switch data back and forth and each keeps its own warm index.
+nlp_processors = {}
+nlp_processors_lock = threading.Lock()
+# Latest ingestion progress per FAQ file (reported under 'ingest' in /metrics)
+ingest_status = {}
+
+# INGEST_WORKERS pool processes use the spawn start method, which re-imports
+# this file as __mp_main__ when the bot runs as `python app.py`; they only
+# run ingest functions, so they skip the engine and background work.
+POOL_PROCESS = __name__ == '__mp_main__'
+
+nlp_processor = None
+if not POOL_PROCESS:
+    try:
+        logger.info("Starting NLP Processor initialization...")
+        with startup_profile.stage('NLPProcessor() total'):
+            nlp_processor = NLPProcessor()
+        nlp_processors[nlp_processor.faq_file] = nlp_processor
+        ingest_status[nlp_processor.faq_file] = nlp_processor.ingest_progress
+        logger.info("NLP Processor initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize NLP Processor: {e}")
+        nlp_processor = None
 
 def build_env_faq_map():
-    """Discover faq_*.json files in the data directory and build an env->filename map.
+    """Discover faq_*.json / faq_*.jsonl files in the data directory and build an env->filename map.
     Keys are lower-cased environment names derived from the filename after the 'faq_' prefix.
     """
     env_map = {}
@@ -72,9 +113,9 @@ def build_env_faq_map():
             return env_map
 
         for fname in os.listdir(data_dir):
-            if fname.startswith('faq_') and fname.lower().endswith('.json'):
+            if fname.startswith('faq_') and fname.lower().endswith(('.json', '.jsonl')):
                 # derive env name from filename: faq_<env>.json -> <env>
-                env_name = fname[4:-5].lower()
+                env_name = os.path.splitext(fname)[0][4:].lower()
                 env_map[env_name] = fname
     except Exception as e:
         logger.error(f"Error building ENV_FAQ_MAP: {e}")
@@ -89,8 +130,274 @@ if not ENV_FAQ_MAP:
         'ppid': 'faq_ppid.json'
     }
 
+def resolve_env(env):
+    """Canonical ENV_FAQ_MAP key for a requested env; unknown envs fall back to stunting"""
+    env = str(env or 'stunting').lower()
+    return env if env in ENV_FAQ_MAP else 'stunting'
+
+def category_options(faq_file, source=None):
+    """NLPProcessor arguments for a FAQ file's processor. Every env's keyword
+    pass uses the categories of the startup FAQ file, as it did when a single
+    processor switch_faq()'d between files; only that file's processor builds
+    them. `source` returns the processor to take them from (default: the live
+    startup processor, so a reload of that file is picked up)."""
+    if nlp_processor is None or faq_file == nlp_processor.faq_file:
+        return {}
+    return {'category_source': source or (lambda: nlp_processor)}
+
+def get_processor(env):
+    """Return the prepared NLPProcessor for an environment, building it on first use"""
+    faq_file = ENV_FAQ_MAP.get(env, 'faq_stunting.json')
+    processor = nlp_processors.get(faq_file)
+    if processor is None:
+        with nlp_processors_lock:
+            processor = nlp_processors.get(faq_file)
+            if processor is None:
+                logger.info(f"Preparing NLP index for env={env} ({faq_file})")
+                progress = ingest_status[faq_file] = IngestProgress(faq_file)
+                with startup_profile.stage(f'NLPProcessor({faq_file})'):
+                    processor = NLPProcessor(faq_file=faq_file, progress=progress, **category_options(faq_file))
+                nlp_processors[faq_file] = processor
+    return processor
+
+# Rolling per-environment analytics, flushed as compact summaries
+# (ANALYTICS_* settings) and served from /analytics.
+analytics = AnalyticsAggregator.from_env()
+
+def refresh_suggest_popularity():
+    """Rank /suggest by how often each FAQ was answered by all workers, as
+    recorded by analytics, so ranking is the same in every worker and
+    survives reloads and restarts; record_hit() adds this worker's answers
+    until the next refresh."""
+    try:
+        hits = analytics.faq_hits()
+    except Exception as e:
+        logger.error(f"Could not read FAQ popularity from analytics: {e}")
+        return
+    for env, faq_file in ENV_FAQ_MAP.items():
+        processor = nlp_processors.get(faq_file)
+        if processor is not None:
+            processor.suggest_index.set_popularity(hits.get(env, {}))
+
+if not POOL_PROCESS:
+    analytics.start_flusher(float(os.environ.get('ANALYTICS_FLUSH_INTERVAL', '300')),
+                            on_flush=refresh_suggest_popularity)
+
+# Readiness is separate from liveness: '/' answers as soon as Flask is up,
+# '/ready' only once every environment has an index and warm-up has run.
+readiness = {
+    'ready': False,
+    'stage': 'starting',
+    'envs': {},
+    'warmup': {},
+    'started_at': datetime.now().isoformat(),
+    'ready_at': None
+}
+
+# Per-worker status file (WORKER_STATE_DIR) read by the restart watcher
+# during rolling reloads.
+worker_state = WorkerState.from_env()
+if not POOL_PROCESS:
+    worker_state.register()
+
+def prepare_engines():
+    """Build every environment's index, then replay frequent questions through it"""
+    try:
+        readiness['stage'] = 'indexing'
+        worker_state.update(stage='indexing')
+        for env in ENV_FAQ_MAP:
+            readiness['envs'][env] = False
+            get_processor(env)
+            readiness['envs'][env] = True
+        refresh_suggest_popularity()
+
+        if os.environ.get('WARMUP_ENABLED', '1').lower() not in ('0', 'false', 'no'):
+            readiness['stage'] = 'warming_up'
+            worker_state.update(stage='warming_up')
+            limit = int(os.environ.get('WARMUP_QUESTIONS', '20'))
+            questions, sources = warmup.load_warmup_questions(list(ENV_FAQ_MAP), limit=limit)
+            for env, qs in questions.items():
+                with in_use(lambda: get_processor(env)) as processor:
+                    result = warmup.replay(processor, env, qs)
+                result['source'] = sources.get(env)
+                readiness['warmup'][env] = result
+                logger.info(f"Warm-up env={env}: {result}")
+
+        readiness['stage'] = 'ready'
+        readiness['ready_at'] = datetime.now().isoformat()
+        readiness['ready'] = True
+        worker_state.update(stage='ready', ready=True, ready_at=readiness['ready_at'])
+        logger.info("All environments prepared; bot is ready")
+        if startup_profile.enabled():
+            print(startup_profile.report())
+    except Exception as e:
+        readiness['stage'] = 'failed'
+        readiness['error'] = str(e)
+        worker_state.update(stage='failed', error=str(e))
+        logger.error(f"Failed to prepare environments: {e}")
+
+# With PREPARE_BEFORE_SERVING the worker finishes indexing and warm-up before
+# gunicorn lets it accept connections, so a replacement worker never serves
+# cold; otherwise preparation runs in the background and '/ready' reports it.
+if nlp_processor is not None:
+    if os.environ.get('PREPARE_BEFORE_SERVING', '0').lower() in ('1', 'true', 'yes'):
+        prepare_engines()
+    else:
+        threading.Thread(target=prepare_engines, name='prepare-engines', daemon=True).start()
+
+def faq_source_mtime(faq_file):
+    try:
+        return os.stat(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', faq_file)).st_mtime_ns
+    except OSError:
+        return None
+
+# mtime of the last re-ingestion attempt per FAQ file, so a file that fails
+# to load is not retried until it changes again
+reload_attempts = {}
+
+def reload_changed_faqs():
+    """Re-ingest FAQ files that changed since their index was built.
+
+    The new index is built and warmed up next to the live one; requests keep
+    using the previous snapshot until the new one is complete and swapped in.
+    A file that fails to load leaves the previous snapshot live; a valid empty
+    file is swapped in like any other. The replaced processor's answer store
+    is closed once the requests still using it are done.
+    """
+    global nlp_processor
+    for env, faq_file in list(ENV_FAQ_MAP.items()):
+        current = nlp_processors.get(faq_file)
+        mtime = faq_source_mtime(faq_file)
+        if current is None or mtime is None or mtime == current.source_mtime or reload_attempts.get(faq_file) == mtime:
+            continue
+        reload_attempts[faq_file] = mtime
+        logger.info(f"FAQ file {faq_file} changed; re-ingesting env={env} in the background")
+        progress = ingest_status[faq_file] = IngestProgress(faq_file)
+        try:
+            fresh = NLPProcessor(faq_file=faq_file, progress=progress, **category_options(faq_file))
+            if progress.state.get('error'):
+                raise ValueError(progress.state['error'])
+            if fresh.source_mtime is None:
+                raise ValueError('FAQ file disappeared while re-ingesting')
+            if os.environ.get('WARMUP_ENABLED', '1').lower() not in ('0', 'false', 'no'):
+                questions, _ = warmup.load_warmup_questions([env], limit=int(os.environ.get('WARMUP_QUESTIONS', '20')))
+                warmup.replay(fresh, env, questions.get(env, []))
+        except Exception as e:
+            progress.update(stage='failed', error=str(e))
+            logger.error(f"Re-ingesting {faq_file} failed, keeping the previous index: {e}")
+            continue
+        with nlp_processors_lock:
+            nlp_processors[faq_file] = fresh
+            if nlp_processor is current:
+                nlp_processor = fresh
+        current.retire()
+        refresh_suggest_popularity()
+        # shadow mode rebuilds its candidate from the new file on next use
+        shadow.invalidate(faq_file)
+        logger.info(f"New index for env={env} is live ({len(fresh.faqs)} FAQs)")
+
+def watch_faq_files(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            reload_changed_faqs()
+        except Exception as e:
+            logger.error(f"FAQ file watcher failed: {e}")
+
+# FAQ_RELOAD_INTERVAL > 0 polls the FAQ files and swaps in a re-ingested
+# index when one changes, without restarting the worker.
+FAQ_RELOAD_INTERVAL = float(os.environ.get('FAQ_RELOAD_INTERVAL', '0'))
+if nlp_processor is not None and FAQ_RELOAD_INTERVAL > 0:
+    threading.Thread(target=watch_faq_files, args=(FAQ_RELOAD_INTERVAL,), name='faq-watcher', daemon=True).start()
+
+# Concurrent identical questions (same env and text, ignoring case and
+# surrounding whitespace) share one get_response() computation instead of
+# each running the full scoring pass.
+ask_flight = SingleFlight()
+
+# Per-client / per-environment rate limits and a global concurrency cap in
+# front of /ask (configured through ADMISSION_* environment variables).
+admission = AdmissionController.from_env()
+
+# Optional cross-environment search: score the question against every loaded
+# environment in parallel and answer from the best one (CROSS_ENV_* settings).
+fanout = FanOutSearcher.from_env(get_processor)
+CROSS_ENV_DEFAULT = os.environ.get('CROSS_ENV_SEARCH', '0').lower() in ('1', 'true', 'yes')
+
+# Sampling profiler for live workers: a fraction of requests, a time window,
+# or requests carrying X-Profiler-Token (PROFILER_* settings).
+profiler = SamplingProfiler.from_env()
+
+@app.before_request
+def start_request_profile():
+    g.profiled = False
+    if request.path.startswith('/profiler'):
+        return
+    if profiler.should_profile(request.headers.get('X-Profiler-Token')):
+        env = request.args.get('env')
+        if not env and request.is_json:
+            env = (request.get_json(silent=True) or {}).get('env')
+        profiler.begin(request.endpoint, resolve_env(env))
+        g.profiled = True
+
+@app.teardown_request
+def end_request_profile(exc=None):
+    if g.get('profiled'):
+        profiler.end()
+
+def build_candidate_processor(env, config):
+    """Candidate engine for shadow mode: same FAQ file, different matcher settings.
+    Like production, its keyword pass uses the startup file's categories, here
+    from the candidate built for that file."""
+    faq_file = ENV_FAQ_MAP.get(env, 'faq_stunting.json')
+    startup_env = next((e for e, f in ENV_FAQ_MAP.items()
+                        if nlp_processor is not None and f == nlp_processor.faq_file), None)
+    source = (lambda: shadow.candidate(startup_env)) if startup_env else None
+    return NLPProcessor(faq_file=faq_file, **config, **category_options(faq_file, source))
+
+# Shadow mode: a sample of live questions is re-scored off the request path
+# by a candidate matcher configuration (SHADOW_CONFIG) for comparison.
+shadow = ShadowScorer.from_env(build_candidate_processor,
+                               source_key=lambda env: ENV_FAQ_MAP.get(env, 'faq_stunting.json'))
+
+def request_flag(value, default):
+    """Boolean request option: JSON true/false or the strings 1/true/yes (0/false/no)"""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return isinstance(value, str) and value.strip().lower() in ('1', 'true', 'yes')
+
+def loaded_envs():
+    """Environments whose index is already prepared in this worker"""
+    return [env for env, faq_file in ENV_FAQ_MAP.items() if faq_file in nlp_processors]
+
+def compute_response(question, env, cross_env=False):
+    """Run the NLP pipeline for a question in the given environment"""
+    if cross_env:
+        return fanout.search(question, env, loaded_envs())
+    with in_use(lambda: get_processor(env)) as processor:
+        return processor.get_response(question, env=env)
+
+def compute_admitted(question, env, cross_env=False):
+    """compute_response() inside an admission slot. Only the single-flight
+    leader runs this, so requests sharing its result hold no slot. Returns
+    (response, seconds, CPU seconds) of the computation itself."""
+    with admission.slot():
+        started, started_cpu = time.perf_counter(), time.thread_time()
+        response = compute_response(question, env, cross_env)
+        return response, time.perf_counter() - started, time.thread_time() - started_cpu
+
+def answer_response(response):
+    """Serialize an answer, reusing the pre-encoded body when available"""
+    if isinstance(response, PrerenderedResponse):
+        return app.response_class(response.to_json(), mimetype='application/json')
+    return jsonify(response)
+
 def log_to_admin_backend(session_id, question, answer, confidence, category, environment, user_agent="", ip_address=""):
     """Send chat log to admin backend"""
+    if not ADMIN_LOG_ENABLED:
+        return
     try:
         payload = {
             "sessionId": session_id,
@@ -124,11 +431,22 @@ def health_check():
         'status': 'healthy',
         'message': 'FAQ Chatbot is running',
         'nlp_ready': nlp_processor is not None,
+        'ready': readiness['ready'],
         'timestamp': datetime.now().isoformat(),
         'version': '1.0.0',
         'supported_envs': list(ENV_FAQ_MAP.keys())
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 only once every environment is indexed and warmed up"""
+    body = dict(readiness)
+    body['envs'] = dict(readiness['envs'])
+    body['status'] = 'ready' if readiness['ready'] else 'not_ready'
+    body['pid'] = os.getpid()
+    body['timestamp'] = datetime.now().isoformat()
+    return jsonify(body), (200 if readiness['ready'] else 503)
+
 @app.route('/ask', methods=['POST'])
 def ask_question():
     """Handle FAQ questions for multiple environments"""
@@ -157,24 +475,54 @@ def ask_question():
                 'category': 'system_error',
                 'status': 'error'
             }), 503
-        # Ambil parameter lingkungan (env), default ke 'stunting' jika tidak ada
-        env = data.get('env', 'stunting').lower()
+        # Ambil parameter lingkungan (env), default ke 'stunting' jika tidak ada.
+        # Env yang tidak dikenal dipetakan ke 'stunting' sebelum admission, agar
+        # rate limit per IP tidak bisa dihindari dengan mengganti-ganti env.
+        env = resolve_env(data.get('env'))
         faq_file = ENV_FAQ_MAP.get(env, 'faq_stunting.json')
-        # Ganti FAQ jika berbeda
-        if nlp_processor.faq_file != faq_file:
-            nlp_processor.switch_faq(faq_file)
-        
-        response = nlp_processor.get_response(question, env=env)
+        cross_env = request_flag(data.get('cross_env'), CROSS_ENV_DEFAULT)
+        try:
+            admission.check(request.remote_addr, env)
+            (response, elapsed, elapsed_cpu), coalesced = ask_flight.do(
+                SingleFlight.make_key(env + ('|all' if cross_env else ''), question),
+                compute_admitted, question, env, cross_env
+            )
+        except AdmissionRejected as rejected:
+            logger.warning(f"Admission rejected ({rejected.reason}) for {request.remote_addr} env={env}")
+            resp = jsonify({
+                'answer': 'Maaf, server sedang sibuk. Silakan coba lagi beberapa saat lagi.',
+                'confidence': 0.0,
+                'category': 'rate_limited' if rejected.status == 429 else 'system_busy',
+                'status': 'error',
+                'error': rejected.reason
+            })
+            resp.status_code = rejected.status
+            resp.headers['Retry-After'] = str(rejected.retry_after)
+            return resp
+        if not coalesced and not cross_env:
+            shadow.submit(env, question, response, elapsed, elapsed_cpu)
+        # Waiters share the leader's dict; give each request its own copy
+        if coalesced:
+            response = response.copy()
         
+        source_env = response.get('source_env', env)
+        analytics.record(env, question, response)
+        if response.get('status') == 'found':
+            get_processor(source_env).suggest_index.record_hit(response.get('faq_id'))
+
         # Generate session ID if not provided
         session_id = data.get('sessionId', str(uuid.uuid4()))
         
         # Log to file
         logger.info(f"Question: {question}")
         logger.info(f"Env: {env} | FAQ file: {faq_file}")
+        if source_env != env:
+            logger.info(f"Answered from env: {source_env}")
         logger.info(f"Category: {response['category']}")
         logger.info(f"Confidence: {response['confidence']:.3f}")
         logger.info(f"Status: {response['status']}")
+        if coalesced:
+            logger.info("Response shared with an identical in-flight request")
         
         # Prepare answer to send: prefer formatted_answer when available
         answer_to_send = response.get('formatted_answer') or response.get('answer')
@@ -193,7 +541,7 @@ def ask_question():
         
         # Don't add sessionId to response - widget doesn't need it
         
-        return jsonify(response)
+        return answer_response(response)
     except Exception as e:
         logger.error(f"Error processing question: {e}")
         return jsonify({
@@ -203,17 +551,119 @@ def ask_question():
             'status': 'error'
         }), 500
 
+@app.route('/suggest', methods=['GET'])
+def suggest_questions():
+    """Autocomplete FAQ questions for a typed prefix"""
+    try:
+        env = request.args.get('env', 'stunting').lower()
+        query = request.args.get('q', '')[:100]
+        limit = min(max(request.args.get('limit', 5, type=int), 1), 10)
+        if not nlp_processor or not query.strip():
+            return jsonify({'suggestions': [], 'env': env})
+        suggestions = get_processor(env).suggest_index.suggest(query, limit=limit)
+        return jsonify({'suggestions': suggestions, 'env': env})
+    except Exception as e:
+        logger.error(f"Error getting suggestions: {e}")
+        return jsonify({'suggestions': [], 'env': request.args.get('env', 'stunting')})
+
+def admin_authorized():
+    """Endpoints exposing user questions or controlling the profiler require
+    the admin PROFILER_TOKEN (X-Profiler-Token header)"""
+    return profiler.check_token(request.headers.get('X-Profiler-Token'))
+
+@app.route('/analytics', methods=['GET'])
+def get_analytics():
+    """Pre-aggregated question analytics, merged across gunicorn workers"""
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden', 'status': 'error'}), 403
+    try:
+        env = request.args.get('env')
+        env = resolve_env(env) if env else None
+        buckets = min(max(request.args.get('buckets', 24, type=int), 1), analytics.keep_buckets)
+        top = min(max(request.args.get('top', 10, type=int), 1), 50)
+        result = analytics.query(env=env, buckets=buckets, top=top)
+        result.update({
+            'env': env,
+            'bucket_seconds': analytics.bucket_seconds,
+            'timestamp': datetime.now().isoformat()
+        })
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error getting analytics: {e}")
+        return jsonify({'buckets': [], 'totals': {}, 'status': 'error'}), 500
+
+@app.route('/profiler/start', methods=['POST'])
+def profiler_start():
+    """Profile requests on this worker for a time window (all, or a sample_rate fraction)"""
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden', 'status': 'error'}), 403
+    data = request.get_json(silent=True) or {}
+    seconds = min(max(float(data.get('seconds', 60)), 1), 3600)
+    profiler.start_window(seconds, data.get('sample_rate'))
+    return jsonify({'status': 'started', 'seconds': seconds, 'profiler': profiler.stats()})
+
+@app.route('/profiler/stop', methods=['POST'])
+def profiler_stop():
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden', 'status': 'error'}), 403
+    profiler.stop_window()
+    return jsonify({'status': 'stopped', 'profiler': profiler.stats()})
+
+@app.route('/profiler/profile', methods=['GET'])
+def profiler_profile():
+    """Aggregated stacks as collapsed text (default) or speedscope JSON"""
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden', 'status': 'error'}), 403
+    endpoint = request.args.get('endpoint')
+    env = request.args.get('env')
+    if request.args.get('format') == 'speedscope':
+        return jsonify(profiler.speedscope(endpoint, env))
+    return app.response_class(profiler.collapsed(endpoint, env), mimetype='text/plain')
+
+@app.route('/profiler/dump', methods=['POST'])
+def profiler_dump():
+    """Write the current profile to PROFILER_DIR, optionally clearing it"""
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden', 'status': 'error'}), 403
+    files = profiler.dump()
+    if (request.get_json(silent=True) or {}).get('reset'):
+        profiler.reset()
+    return jsonify({'status': 'ok', 'files': files})
+
+@app.route('/shadow', methods=['GET'])
+def get_shadow_stats():
+    """Shadow-mode comparison of the candidate matcher against production"""
+    if not admin_authorized():
+        return jsonify({'error': 'Forbidden', 'status': 'error'}), 403
+    return jsonify(shadow.stats())
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Runtime counters for the request pipeline"""
+    return jsonify({
+        'pid': os.getpid(),
+        'single_flight': ask_flight.stats(),
+        'admission': admission.stats(),
+        'startup': startup_profile.snapshot(),
+        'cross_env': fanout.stats(),
+        'profiler': profiler.stats(),
+        'corpus': {env: getattr(nlp_processors[ENV_FAQ_MAP[env]], 'compaction', {}) for env in loaded_envs()},
+        'answer_store': {env: nlp_processors[ENV_FAQ_MAP[env]].answer_store_stats() for env in loaded_envs()},
+        'ingest': {env: ingest_status[f].as_dict() for env, f in ENV_FAQ_MAP.items() if f in ingest_status},
+        'timestamp': datetime.now().isoformat()
+    })
+
 @app.route('/categories', methods=['GET'])
 def get_categories():
     """Get available FAQ categories for selected environment"""
     try:
         env = request.args.get('env', 'stunting').lower()
-        faq_file = ENV_FAQ_MAP.get(env, 'faq_stunting.json')
-        if nlp_processor.faq_file != faq_file:
-            nlp_processor.switch_faq(faq_file)
-        if not nlp_processor or not nlp_processor.faqs:
+        if not nlp_processor:
+            return jsonify({'categories': []})
+        processor = get_processor(env)
+        if not processor.faqs:
             return jsonify({'categories': []})
-        categories = nlp_processor.get_all_categories()
+        categories = processor.get_all_categories()
         # Deskripsi kategori generik
         generic_desc = {
             'umum': 'Informasi umum',
@@ -249,12 +699,11 @@ def get_all_faqs():
     """Get all FAQ data for selected environment"""
     try:
         env = request.args.get('env', 'stunting').lower()
-        faq_file = ENV_FAQ_MAP.get(env, 'faq_stunting.json')
-        if nlp_processor.faq_file != faq_file:
-            nlp_processor.switch_faq(faq_file)
         if not nlp_processor:
             return jsonify({'faqs': []})
-        return jsonify({'faqs': nlp_processor.faqs})
+        with in_use(lambda: get_processor(env)) as processor:
+            faqs = processor.all_faqs()
+        return jsonify({'faqs': faqs})
     except Exception as e:
         logger.error(f"Error getting FAQs: {e}")
         return jsonify({'faqs': []})
@@ -264,9 +713,6 @@ def get_stats():
     """Get bot statistics for selected environment"""
     try:
         env = request.args.get('env', 'stunting').lower()
-        faq_file = ENV_FAQ_MAP.get(env, 'faq_stunting.json')
-        if nlp_processor.faq_file != faq_file:
-            nlp_processor.switch_faq(faq_file)
         if not nlp_processor:
             return jsonify({
                 'total_faqs': 0,
@@ -275,11 +721,12 @@ def get_stats():
                 'env': env,
                 'status': 'error'
             })
-        total_questions = sum(len(faq['questions']) for faq in nlp_processor.faqs)
+        processor = get_processor(env)
+        total_questions = sum(len(faq['questions']) for faq in processor.faqs)
         return jsonify({
-            'total_faqs': len(nlp_processor.faqs),
+            'total_faqs': len(processor.faqs),
             'total_questions': total_questions,
-            'categories': len(nlp_processor.get_all_categories()),
+            'categories': len(processor.get_all_categories()),
             'env': env,
             'status': 'active'
         })
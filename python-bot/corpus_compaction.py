@@ -0,0 +1,71 @@
+def _summary(before, after):
+    return {
+        'before': before,
+        'after': after,
+        'removed': before - after,
+        'removed_pct': round(100.0 * (before - after) / before, 1) if before else 0.0
+    }
+
+
+def compact_questions(texts, owners):
+    """Collapse questions that are identical after preprocessing.
+
+    `texts` are preprocessed questions and `owners` the FAQ dict of each one.
+    Different surface forms ("Apa itu PPID?", "apa itu ppid") stem to the same
+    text and would score identically, and np.argmax picks the first of equal
+    scores, so only the first occurrence is kept; answers do not change.
+
+    Returns (keep, sources, summary): indexes into `texts` to keep, the FAQ
+    ids that contributed each kept question (provenance) and before/after
+    counts.
+    """
+    first = {}
+    keep = []
+    sources = []
+    for i, (text, faq) in enumerate(zip(texts, owners)):
+        faq_id = faq.get('id') if isinstance(faq, dict) else None
+        j = first.get(text)
+        if j is None:
+            first[text] = len(keep)
+            keep.append(i)
+            sources.append([faq_id])
+        elif faq_id not in sources[j]:
+            sources[j].append(faq_id)
+    return keep, sources, _summary(len(texts), len(keep))
+
+
+def compact_keywords(categories, keyword_to_faq):
+    """Drop category keywords the first-match keyword scan can never reach.
+
+    check_ppid_category() walks categories and their keywords in order and
+    returns on the first hit, comparing the lowercased keyword. A keyword
+    repeated later (in another category, or differing only in case) tests
+    exactly like its first copy, so it can only be reached when that copy
+    already failed. Empty and non-string keywords are skipped by the scan and
+    are dropped as well.
+
+    `categories` is updated in place. Returns (sources, summary) where
+    sources maps each kept keyword to the categories and FAQ ids that listed it.
+    """
+    seen = {}
+    sources = {}
+    before = after = 0
+    for category, data in categories.items():
+        kept = []
+        for keyword in data.get('keywords', []):
+            before += 1
+            if not isinstance(keyword, str) or not keyword:
+                continue
+            kw = keyword.lower()
+            faq = keyword_to_faq.get(kw)
+            origin = {'category': category, 'faq_id': faq.get('id') if isinstance(faq, dict) else None}
+            if kw in seen:
+                if origin not in sources[kw]:
+                    sources[kw].append(origin)
+                continue
+            seen[kw] = True
+            sources[kw] = [origin]
+            kept.append(keyword)
+            after += 1
+        data['keywords'] = kept
+    return sources, _summary(before, after)
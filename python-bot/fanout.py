@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait
+
+from nlp_processor import in_use
+
+
+class FanOutSearcher:
+    """Score one question against several environments concurrently.
+
+    Used for questions sent to the "wrong" widget (e.g. a stunting question on
+    the PPID site). Every environment runs its own get_response() on a shared
+    thread pool; confidences are calibrated per environment so they can be
+    compared, and environments that miss the latency budget are ignored.
+
+    Calibration maps a raw confidence c to
+        (c - threshold) / (1 - threshold) * scale + offset
+    where threshold is the environment's match_threshold, so a score just at
+    the threshold is 0 everywhere. `scale`/`offset` come from `calibration`,
+    e.g. {"stunting": {"scale": 0.9, "offset": 0.0}}. The requested (home)
+    environment gets `home_bonus` so ties stay local.
+
+    A search never takes longer than the budget: scoring that has not started
+    by then is cancelled, and when no environment answered in time (or the
+    home environment failed) the home environment's not_found answer is
+    returned. Scoring already running cannot be interrupted and keeps its
+    pool thread until it finishes.
+    """
+
+    def __init__(self, get_processor, calibration=None, budget=0.5, home_bonus=0.05, max_workers=4):
+        self.get_processor = get_processor
+        self.calibration = {k.lower(): v for k, v in (calibration or {}).items()}
+        self.budget = float(budget)
+        self.home_bonus = float(home_bonus)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix='fanout')
+        self._lock = threading.Lock()
+        self.counters = {
+            'searches': 0,
+            'answered_from_other_env': 0,
+            'env_timeouts': 0,
+            'env_errors': 0
+        }
+
+    @classmethod
+    def from_env(cls, get_processor):
+        """Build a searcher from CROSS_ENV_* environment variables."""
+        calibration = {}
+        raw = os.environ.get('CROSS_ENV_CALIBRATION')
+        if raw:
+            try:
+                calibration = json.loads(raw)
+            except Exception as e:
+                print(f"Warning: invalid CROSS_ENV_CALIBRATION, ignoring: {e}")
+        return cls(
+            get_processor,
+            calibration=calibration,
+            budget=float(os.environ.get('CROSS_ENV_BUDGET', '0.5')),
+            home_bonus=float(os.environ.get('CROSS_ENV_HOME_BONUS', '0.05')),
+            max_workers=int(os.environ.get('CROSS_ENV_WORKERS', '4'))
+        )
+
+    def calibrate(self, env, processor, response):
+        """Comparable score for a response, or None when it is not an answer."""
+        if response.get('status') not in ('found', 'ppid_link'):
+            return None
+        threshold = getattr(processor, 'match_threshold', 0.0)
+        span = (1.0 - threshold) or 1.0
+        conf = self.calibration.get(env) or {}
+        score = (float(response.get('confidence', 0.0)) - threshold) / span
+        return score * float(conf.get('scale', 1.0)) + float(conf.get('offset', 0.0))
+
+    def _score(self, env, question):
+        start = time.perf_counter()
+        with in_use(lambda: self.get_processor(env)) as processor:
+            response = processor.get_response(question, env=env)
+        return processor, response, time.perf_counter() - start
+
+    def search(self, question, home_env, envs):
+        """Return the best response across envs, tagged with `source_env`."""
+        # score each FAQ file once: envs sharing a processor (e.g. an unknown
+        # home env served from stunting) would only duplicate the work
+        processors = {}
+        for env in [home_env] + list(envs):
+            processor = self.get_processor(env)
+            if all(p is not processor for p in processors.values()):
+                processors[env] = processor
+        deadline = time.monotonic() + self.budget
+        futures = {self._pool.submit(self._score, env, question): env for env in processors}
+        done, not_done = wait(futures, timeout=self.budget)
+
+        best = None
+        home_response = None
+        timings = {}
+        errors = 0
+        for future in done:
+            env = futures[future]
+            try:
+                processor, response, elapsed = future.result()
+            except Exception as e:
+                errors += 1
+                print(f"Warning: cross-env scoring failed for {env}: {e}")
+                continue
+            timings[env] = round(elapsed, 4)
+            if env == home_env:
+                home_response = response
+            score = self.calibrate(env, processor, response)
+            if score is None:
+                continue
+            if env == home_env:
+                score += self.home_bonus
+            if best is None or score > best[0]:
+                best = (score, env, response)
+
+        timed_out = [futures[f] for f in not_done]
+        if best is None and home_response is None and home_env in timed_out:
+            # nothing usable yet: the home env may still finish within the budget
+            home_future = next(f for f, env in futures.items() if env == home_env)
+            try:
+                _, home_response, elapsed = home_future.result(timeout=max(0.0, deadline - time.monotonic()))
+                timings[home_env] = round(elapsed, 4)
+                timed_out.remove(home_env)
+            except TimeoutError:
+                pass
+            except Exception as e:
+                errors += 1
+                timed_out.remove(home_env)
+                print(f"Warning: cross-env scoring failed for {home_env}: {e}")
+        # queued scoring is dropped so it does not delay later searches
+        for future in not_done:
+            future.cancel()
+        if best is None and home_response is None:
+            home_response = processors[home_env].fallback_response(home_env)
+
+        with self._lock:
+            self.counters['searches'] += 1
+            self.counters['env_timeouts'] += len(timed_out)
+            self.counters['env_errors'] += errors
+            if best is not None and best[1] != home_env:
+                self.counters['answered_from_other_env'] += 1
+
+        if best is not None:
+            _, source_env, response = best
+        else:
+            source_env, response = home_env, home_response
+        # plain dict: extra fields do not fit a pre-rendered body
+        response = dict(response)
+        response['source_env'] = source_env
+        response['cross_env'] = {
+            'searched': sorted(timings),
+            'timed_out': sorted(timed_out)
+        }
+        return response
+
+    def stats(self):
+        """Return fan-out counters."""
+        with self._lock:
+            return dict(self.counters)
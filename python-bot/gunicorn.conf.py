@@ -0,0 +1,65 @@
+"""Gunicorn settings for the bot (loaded from the working directory, or -c).
+
+Only server hooks live here; workers, threads and timeouts are passed on
+the command line (see supervisord.conf).
+"""
+from admission import AdmissionController
+from worker_state import WorkerState
+
+
+def when_ready(server):
+    """Warn when a worker's threads cannot fill the admission queue.
+
+    A gthread worker only accepts as many requests as it has threads; with
+    no more threads than ADMISSION_MAX_CONCURRENT + ADMISSION_MAX_QUEUE the
+    bounded queue never fills and excess requests wait in gunicorn's backlog
+    with no limit instead of being rejected.
+    """
+    admission = AdmissionController.from_env()
+    needed = admission.max_concurrent + admission.max_queue + 1
+    if admission.enabled and server.cfg.threads < needed:
+        server.log.warning("--threads %s leaves the admission queue unused; use at least %s "
+                           "(ADMISSION_MAX_CONCURRENT + ADMISSION_MAX_QUEUE + 1)", server.cfg.threads, needed)
+
+
+# pid -> real age of workers nworkers_changed() moved to the front
+_moved_ages = {}
+
+
+def _restore_ages(server):
+    for pid, age in _moved_ages.items():
+        worker = server.WORKERS.get(pid)
+        if worker is not None:
+            worker.age = age
+    _moved_ages.clear()
+
+
+def nworkers_changed(server, new_value, old_value):
+    """Make TTOU retire workers that are not ready before healthy ones.
+
+    Gunicorn stops its oldest workers (lowest `age`) when the count drops,
+    re-sending the signal on every loop until they exit. During a rolling
+    reload (admin-backend/scripts/restart_watcher.py) a replacement that never
+    became ready must be the one stopped, so workers whose state file does not
+    report ready are moved to the front, newest first, by negating their age.
+    The real ages are restored by child_exit() once no retirement is pending.
+    """
+    if old_value is None or new_value >= old_value:
+        return
+    state_dir = WorkerState.from_env().state_dir
+    if not state_dir:
+        return
+    # a worker moved by an earlier TTOU may be ready by now
+    _restore_ages(server)
+    for pid, worker in list(server.WORKERS.items()):
+        state = WorkerState.read(state_dir, pid)
+        if not (state and state.get('ready')):
+            _moved_ages[pid] = worker.age
+            worker.age = -worker.age
+
+
+def child_exit(server, worker):
+    """Give moved workers their real age back once every retirement is done."""
+    _moved_ages.pop(worker.pid, None)
+    if _moved_ages and len(server.WORKERS) <= server.num_workers:
+        _restore_ages(server)
@@ -0,0 +1,310 @@
+import codecs
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from startup_profile import lazy_import
+
+
+def preprocess_question(text, stopword_remover, stemmer):
+    """Lowercase, strip punctuation, remove stopwords and stem (Indonesian)"""
+    if not text:
+        return ""
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    try:
+        text = stopword_remover.remove(text)
+    except Exception as e:
+        print(f"Warning: Stopword removal failed: {e}")
+    try:
+        text = stemmer.stem(text)
+    except Exception as e:
+        print(f"Warning: Stemming failed: {e}")
+    return text
+
+
+def sastrawi_components():
+    """(stopword_remover, stemmer) built from Sastrawi"""
+    stemmer_factory = lazy_import('Sastrawi.Stemmer.StemmerFactory').StemmerFactory
+    stopword_factory = lazy_import('Sastrawi.StopWordRemover.StopWordRemoverFactory').StopWordRemoverFactory
+    return stopword_factory().create_stop_word_remover(), stemmer_factory().create_stemmer()
+
+
+class IngestProgress:
+    """Progress of one FAQ file ingestion, shared with /metrics."""
+
+    def __init__(self, source=None, report_every=5.0):
+        self.source = source
+        self.report_every = float(report_every)
+        self._lock = threading.Lock()
+        self._last_report = 0.0
+        self.state = {
+            'stage': 'pending',
+            'faqs': 0,
+            'bytes_read': 0,
+            'total_bytes': 0,
+            'questions': 0,
+            'questions_done': 0,
+            'started_at': time.time(),
+            'finished_at': None,
+            'error': None
+        }
+
+    def update(self, **fields):
+        with self._lock:
+            self.state.update(fields)
+            if fields.get('stage') in ('done', 'failed'):
+                self.state['finished_at'] = time.time()
+        self._maybe_report(force='stage' in fields)
+
+    def advance(self, field, amount=1):
+        """Add to a counter such as faqs, bytes_read or questions_done"""
+        with self._lock:
+            self.state[field] += amount
+        self._maybe_report()
+
+    def _maybe_report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_report < self.report_every:
+            return
+        self._last_report = now
+        s = self.as_dict()
+        line = f"Ingest {self.source}: {s['stage']}, {s['faqs']} FAQs"
+        if s['total_bytes']:
+            line += f", {s['bytes_read'] * 100 // s['total_bytes']}% read"
+        if s['questions']:
+            line += f", {s['questions_done']}/{s['questions']} questions preprocessed"
+        print(line)
+
+    def as_dict(self):
+        with self._lock:
+            state = dict(self.state)
+        end = state['finished_at'] or time.time()
+        state['elapsed'] = round(end - state['started_at'], 3)
+        return state
+
+
+def _iter_json_lines(fh, progress):
+    for raw in fh:
+        if progress is not None:
+            progress.advance('bytes_read', len(raw))
+        line = raw.strip()
+        if line:
+            yield json.loads(line)
+
+
+# trailing characters that may still belong to a number cut by a chunk boundary
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*\Z')
+
+
+def _iter_json_array(fh, progress, chunk_size):
+    """Yield the elements of a top-level array (or of the "faqs" array in
+    a top-level object) without decoding the whole document at once."""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def more():
+        nonlocal buf, pos, eof
+        raw = fh.read(chunk_size)
+        if progress is not None:
+            progress.advance('bytes_read', len(raw))
+        if not raw:
+            eof = True
+        buf = buf[pos:] + utf8.decode(raw, final=not raw)
+        pos = 0
+
+    def skip(chars=' \t\r\n'):
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            more()
+
+    def value():
+        nonlocal pos
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more()
+                continue
+            # a number at the end of the buffer may continue in the next chunk,
+            # possibly after a '.', 'e' or sign the decoder stopped at
+            if not eof and _NUMBER_TAIL.match(buf, end):
+                more()
+                continue
+            pos = end
+            return obj
+
+    def expect(char):
+        nonlocal pos
+        skip()
+        if pos >= len(buf) or buf[pos] != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", buf, pos)
+        pos += 1
+
+    skip('\ufeff \t\r\n')
+    if buf[pos:pos + 1] == '{':
+        pos += 1
+        while True:
+            skip(' \t\r\n,')
+            if buf[pos:pos + 1] == '}':
+                raise ValueError('FAQ file object has no "faqs" array')
+            key = value()
+            expect(':')
+            skip()
+            if key == 'faqs':
+                break
+            value()
+    expect('[')
+    while True:
+        skip(' \t\r\n,')
+        if pos >= len(buf):
+            raise json.JSONDecodeError('Unterminated array', buf, pos)
+        if buf[pos] == ']':
+            return
+        yield value()
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+
+def iter_faqs(path, progress=None, chunk_size=1 << 20):
+    """Yield FAQ dicts from a JSON array, a {"faqs": [...]} object or a JSON
+    Lines file (.jsonl), reading `chunk_size` bytes at a time."""
+    if progress is not None:
+        progress.update(stage='reading', total_bytes=os.path.getsize(path), bytes_read=0, faqs=0)
+    with open(path, 'rb') as fh:
+        if path.lower().endswith('.jsonl'):
+            items = _iter_json_lines(fh, progress)
+        else:
+            items = _iter_json_array(fh, progress, chunk_size)
+        for faq in items:
+            if not isinstance(faq, dict):
+                raise ValueError(f"FAQ entries must be objects, got {type(faq).__name__}")
+            if progress is not None:
+                progress.advance('faqs')
+            yield faq
+
+
+# process-pool workers build their own Sastrawi components once
+_worker_components = None
+
+
+def _init_worker():
+    global _worker_components
+    _worker_components = sastrawi_components()
+
+
+def _preprocess_chunk(texts):
+    remover, stemmer = _worker_components
+    return [preprocess_question(t, remover, stemmer) for t in texts]
+
+
+def preprocess_questions(faqs, preprocess, chunk_size=500, workers=0, progress=None):
+    """Preprocess every FAQ question in chunks.
+
+    Yields (texts, owners) per chunk in FAQ order, skipping questions that
+    preprocess to an empty string. With workers > 1 chunks are spread over a
+    process pool whose workers build their own stemmer; otherwise `preprocess`
+    runs in this process. The pool uses the spawn start method, since forking
+    a gunicorn worker that already runs background threads can copy locks
+    held by them; spawned workers re-import the entry script, so it needs an
+    `if __name__ == '__main__'` guard around anything it starts.
+    """
+    pairs = [(q, faq) for faq in faqs for q in faq.get('questions') or []]
+    if progress is not None:
+        progress.update(stage='preprocessing', questions=len(pairs), questions_done=0)
+    chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+
+    def emit(chunk, processed):
+        if progress is not None:
+            progress.advance('questions_done', len(chunk))
+        kept = [(p, faq) for p, (_, faq) in zip(processed, chunk) if p]
+        return [p for p, _ in kept], [faq for _, faq in kept]
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = pool.map(_preprocess_chunk, [[q for q, _ in chunk] for chunk in chunks])
+            for chunk, processed in zip(chunks, results):
+                yield emit(chunk, processed)
+        return
+    for chunk in chunks:
+        yield emit(chunk, [preprocess(q) for q, _ in chunk])
+
+
+class StreamingTfidf:
+    """TF-IDF built chunk by chunk.
+
+    add() tokenizes a chunk with the default TfidfVectorizer analyzer and
+    keeps only sparse term counts while the vocabulary grows. finish() orders
+    the vocabulary the way sklearn does and fits IDF over every row, so the
+    vectorizer and matrix equal TfidfVectorizer().fit_transform() on all rows.
+    """
+
+    def __init__(self):
+        text = lazy_import('sklearn.feature_extraction.text')
+        self._analyzer = text.CountVectorizer().build_analyzer()
+        self.vocabulary = {}
+        self._chunks = []
+        self.rows = 0
+
+    def add(self, texts):
+        np = lazy_import('numpy')
+        indices, indptr, data = [], [0], []
+        for t in texts:
+            counts = Counter()
+            for token in self._analyzer(t):
+                counts[self.vocabulary.setdefault(token, len(self.vocabulary))] += 1
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        # TfidfVectorizer counts in float64 too, so IDF weighting happens in place
+        self._chunks.append((np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int64),
+                             np.asarray(indptr, dtype=np.int64)))
+        self.rows += len(texts)
+
+    def finish(self):
+        """Return (vectorizer, tfidf_matrix) for all rows added."""
+        if not self.vocabulary:
+            raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+        np = lazy_import('numpy')
+        sparse = lazy_import('scipy.sparse')
+        text = lazy_import('sklearn.feature_extraction.text')
+        pipeline = lazy_import('sklearn.pipeline')
+
+        width = len(self.vocabulary)
+        counts = sparse.vstack([sparse.csr_matrix((d, i, p), shape=(len(p) - 1, width))
+                                for d, i, p in self._chunks]).tocsr()
+        self._chunks = []
+        # same steps as CountVectorizer: sort by first-seen term id, then
+        # renumber terms alphabetically in place (row order of the stored
+        # values decides float rounding when rows are normalized)
+        counts.sort_indices()
+        terms = sorted(self.vocabulary)
+        map_index = np.empty(width, dtype=counts.indices.dtype)
+        for new_id, term in enumerate(terms):
+            map_index[self.vocabulary[term]] = new_id
+        counts.indices = map_index.take(counts.indices, mode='clip')
+        counts.has_sorted_indices = False
+        vocabulary = {t: i for i, t in enumerate(terms)}
+
+        transformer = text.TfidfTransformer().fit(counts)
+        vectorizer = pipeline.Pipeline([
+            ('counts', text.CountVectorizer(vocabulary=vocabulary, dtype=np.float64)),
+            ('tfidf', transformer)
+        ])
+        return vectorizer, transformer.transform(counts, copy=False)
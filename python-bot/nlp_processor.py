@@ -1,16 +1,71 @@
-import nltk
 import json
-import re
 import os
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from Sastrawi.Stemmer.StemmerFactory import StemmerFactory
-from Sastrawi.StopWordRemover.StopWordRemoverFactory import StopWordRemoverFactory
-from fuzzywuzzy import fuzz
-import numpy as np
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from answer_store import BODY_FIELDS, LINK_TEXTS, MemoryAnswerStore, build_store, open_store, split_faq
+from corpus_compaction import compact_keywords, compact_questions
+from ingest import (IngestProgress, StreamingTfidf, iter_faqs, preprocess_question, preprocess_questions,
+                    sastrawi_components)
+from payloads import PayloadTemplate
+from startup_profile import lazy_import, stage
+from suggest_index import SuggestIndex
+
+# scikit-learn, numpy, Sastrawi and fuzzywuzzy are slow to import, so they are
+# loaded on first use instead of when this module is imported.
+def _fuzz():
+    return lazy_import('fuzzywuzzy.fuzz')
+
+def _np():
+    return lazy_import('numpy')
+
+@contextmanager
+def in_use(lookup):
+    """Hold the processor returned by lookup() while the block runs, so a
+    reload that retires it meanwhile keeps its answer store open until the
+    block is done. A processor retired before it could be held is looked up
+    again, so lookup() must return the live one."""
+    while True:
+        processor = lookup()
+        if processor.acquire():
+            break
+    try:
+        yield processor
+    finally:
+        processor.release()
+
+# Canned answers used when no FAQ matches, per environment family
+PPID_FALLBACK_ANSWERS = [
+    "Maaf, saya tidak dapat menemukan jawaban yang tepat untuk pertanyaan Anda.",
+    "Berikut beberapa topik yang bisa saya bantu:",
+    "• Apa itu PPID?",
+    "• Cara permohonan informasi publik",
+    "• Prosedur pengajuan keberatan",
+    "• Jenis informasi publik",
+    "• Layanan website PPID",
+    "• Kontak dan alamat PPID",
+    "",
+    "Silakan ajukan pertanyaan dengan kata kunci yang lebih spesifik, atau hubungi petugas PPID untuk informasi lebih lanjut."
+]
+
+STUNTING_FALLBACK_ANSWERS = [
+    "Maaf, saya tidak dapat menemukan jawaban yang tepat untuk pertanyaan Anda.",
+    "Berikut beberapa topik yang bisa saya bantu:",
+    "• Apa itu stunting?",
+    "• Penyebab dan cara mencegah stunting",
+    "• Gizi ibu hamil dan ASI eksklusif", 
+    "• MPASI dan nutrisi anak",
+    "• Imunisasi dan posyandu",
+    "",
+    "Silakan ajukan pertanyaan dengan kata kunci yang lebih spesifik, atau hubungi petugas kesehatan untuk informasi lebih lanjut."
+]
+
+DEFAULT_ANSWER_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'answer_store')
 
 class NLPProcessor:
-    def __init__(self, faq_file=None, fuzzy_threshold=85, fuzzy_short_threshold=90, match_threshold=0.35):
+    def __init__(self, faq_file=None, fuzzy_threshold=85, fuzzy_short_threshold=90, match_threshold=0.35,
+                 tfidf_weight=0.7, fuzzy_weight=0.3, answer_store=None, answer_cache_size=None, progress=None,
+                 category_source=None):
         """Initialize NLP processor and tunable thresholds.
 
         Parameters:
@@ -18,24 +73,56 @@ class NLPProcessor:
         - fuzzy_threshold: fuzzy match threshold for medium/long tokens
         - fuzzy_short_threshold: higher fuzzy threshold for short tokens (<=4 chars)
         - match_threshold: combined score threshold for TF-IDF+fuzzy matching
+        - tfidf_weight / fuzzy_weight: weights of cosine similarity and fuzzy ratio in the combined score
+        - answer_store: where answer bodies live: 'memory', 'mmap' (on-disk store under
+          ANSWER_STORE_DIR) or 'auto' (mmap for files of ANSWER_STORE_MIN_BYTES or more);
+          default from ANSWER_STORE
+        - answer_cache_size: number of FAQs whose rendered responses are cached (ANSWER_CACHE_SIZE)
+        - progress: IngestProgress to report loading/preprocessing progress to
+        - category_source: callable returning the NLPProcessor whose PPID keyword
+          categories answer the keyword pass (app.py: the processor of the startup
+          FAQ file, as when one instance switch_faq()'d between files); this
+          processor then builds no categories of its own
         """
         print("Initializing NLP Processor...")
-        self._download_nltk_data()
         print("Loading Sastrawi components...")
-        self.stemmer = StemmerFactory().create_stemmer()
-        self.stopword_remover = StopWordRemoverFactory().create_stop_word_remover()
-        self.vectorizer = TfidfVectorizer()
+        with stage('sastrawi'):
+            self.stopword_remover, self.stemmer = sastrawi_components()
+        self.vectorizer = None
 
         # file and thresholds
         self.faq_file = faq_file or 'faq_ppid.json'
         self.fuzzy_threshold = int(fuzzy_threshold)
         self.fuzzy_short_threshold = int(fuzzy_short_threshold)
         self.match_threshold = float(match_threshold)
+        self.tfidf_weight = float(tfidf_weight)
+        self.fuzzy_weight = float(fuzzy_weight)
+        self.answer_store_mode = (answer_store or os.environ.get('ANSWER_STORE', 'auto')).lower()
+        self.answer_store_dir = os.environ.get('ANSWER_STORE_DIR') or DEFAULT_ANSWER_STORE_DIR
+        self.answer_store_min_bytes = int(os.environ.get('ANSWER_STORE_MIN_BYTES', str(4 * 1024 * 1024)))
+        self.answer_cache_size = int(answer_cache_size or os.environ.get('ANSWER_CACHE_SIZE', '256'))
+        self.ingest_chunk_size = int(os.environ.get('INGEST_CHUNK_SIZE', '500'))
+        self.ingest_workers = int(os.environ.get('INGEST_WORKERS', '0'))
+        self.ingest_progress = progress or IngestProgress(self.faq_file)
+        self.category_source = category_source
+        # requests holding this processor (in_use()); retire() defers closing
+        # the answer store until they are done
+        self._users = 0
+        self._retired = False
+        self._users_lock = threading.Lock()
 
         # load data and prepare models
-        self.load_faq_data(self.faq_file)
-        self.prepare_corpus()
-        self._init_ppid_categories()
+        with stage(f'load_faq_data ({self.faq_file})'):
+            self.load_faq_data(self.faq_file)
+        with stage(f'prepare_corpus ({self.faq_file})'):
+            self.prepare_corpus()
+        if category_source is None:
+            with stage(f'init_categories ({self.faq_file})'):
+                self.ingest_progress.update(stage='indexing_keywords')
+                self._init_ppid_categories()
+            with stage(f'compact_keywords ({self.faq_file})'):
+                self._compact_keywords()
+        self.ingest_progress.update(stage='done')
         print("NLP Processor initialized successfully!")
     
     def _init_ppid_categories(self):
@@ -54,19 +141,25 @@ class NLPProcessor:
         # map individual keyword (lowercased) -> faq dict for precise answers
         self.keyword_to_faq = {}
 
+        # Descriptions are FAQ answers, which live in the answer store. Each
+        # category keeps the positions of the FAQs whose first non-empty
+        # answer describes it ('description_faqs') plus a fallback text;
+        # category_description() reads them only when a response needs one.
+
         # 1) Add explicit keyword entries first (aggregate per category)
-        for faq in getattr(self, 'faqs', []) or []:
+        for pos, faq in enumerate(getattr(self, 'faqs', []) or []):
             kws = faq.get('keywords') or []
-            # also extract link texts as useful keywords (e.g., 'LHKPN')
-            links = faq.get('links') or []
-            link_texts = [l.get('text', '').lower() for l in links if isinstance(l, dict) and l.get('text')]
+            # also use link texts as keywords (e.g., 'LHKPN'); split_faq
+            # keeps them in the meta record so no body is read here
+            link_texts = faq.get(LINK_TEXTS) or []
 
             if kws or link_texts:
                 key = faq.get('category') or f"faq_{faq.get('id')}"
                 if key not in self.ppid_categories:
                     self.ppid_categories[key] = {
                         'keywords': [],
-                        'description': faq.get('answer', '')
+                        'description': '',
+                        'description_faqs': []
                     }
 
                 # extend existing keywords with new ones (avoid duplicates)
@@ -85,21 +178,19 @@ class NLPProcessor:
                             self.keyword_to_faq[lt] = faq
 
                 self.ppid_categories[key]['keywords'] = list(existing)
-                # keep description if not already set
-                if not self.ppid_categories[key].get('description'):
-                    self.ppid_categories[key]['description'] = faq.get('answer', '')
+                # the first FAQ with a non-empty answer describes the category
+                self.ppid_categories[key]['description_faqs'].append(pos)
 
         # 2) Group remaining FAQs by category and use their questions as keywords
         grouped = {}
-        for faq in getattr(self, 'faqs', []) or []:
+        for pos, faq in enumerate(getattr(self, 'faqs', []) or []):
             cat = faq.get('category') or f"faq_{faq.get('id')}"
             if cat not in grouped:
-                grouped[cat] = {'keywords': set(), 'description': None}
+                grouped[cat] = {'keywords': set(), 'description_faqs': []}
             for q in faq.get('questions', []) or []:
                 if isinstance(q, str) and q.strip():
                     grouped[cat]['keywords'].add(q.lower())
-            if not grouped[cat]['description']:
-                grouped[cat]['description'] = faq.get('answer', '')
+            grouped[cat]['description_faqs'].append(pos)
 
         # Merge grouped keywords into categories that don't already have explicit keywords
         for cat, data in grouped.items():
@@ -118,12 +209,13 @@ class NLPProcessor:
                                 break
                     merged = list(existing)
                     self.ppid_categories[cat]['keywords'] = merged
-                    if not self.ppid_categories[cat].get('description'):
-                        self.ppid_categories[cat]['description'] = data['description'] or f"Informasi tentang {cat}"
+                    self.ppid_categories[cat]['description_faqs'].extend(data['description_faqs'])
+                    self.ppid_categories[cat]['description'] = f"Informasi tentang {cat}"
                 else:
                     self.ppid_categories[cat] = {
                         'keywords': list(data['keywords']),
-                        'description': data['description'] or f"Informasi tentang {cat}"
+                        'description': f"Informasi tentang {cat}",
+                        'description_faqs': data['description_faqs']
                     }
                     # map grouped question keywords to a representative faq in this category
                     for q in data['keywords']:
@@ -242,12 +334,23 @@ class NLPProcessor:
                 }
             }
     
+    def category_description(self, category):
+        """Description of a PPID category: the first non-empty answer among its
+        description FAQs (read from the answer store), else its fallback text"""
+        data = self.ppid_categories.get(category) or {}
+        for pos in data.get('description_faqs', []):
+            answer = self.answers.get(pos).get('answer', '')
+            if answer:
+                return answer
+        return data.get('description', '')
+
     def check_ppid_category(self, question):
         """Check if question relates to PPID information categories"""
         if not question:
             return None
 
         question_lower = question.lower()
+        fuzz = _fuzz()
 
         for category, data in self.ppid_categories.items():
             for keyword in data.get("keywords", []):
@@ -258,7 +361,6 @@ class NLPProcessor:
                 if kw in question_lower or question_lower in kw:
                     result = {
                         "category": category,
-                        "description": data.get("description"),
                         "matched_keyword": keyword
                     }
                     # if we have an originating faq for this keyword, attach it
@@ -274,7 +376,6 @@ class NLPProcessor:
                     if fuzz.partial_ratio(question_lower, kw) > thresh or fuzz.partial_ratio(kw, question_lower) > thresh:
                         result = {
                             "category": category,
-                            "description": data.get("description"),
                             "matched_keyword": keyword
                         }
                         faq_obj = self.keyword_to_faq.get(kw)
@@ -286,46 +387,111 @@ class NLPProcessor:
                     continue
         return None
     
-    def _download_nltk_data(self):
-        """Download required NLTK data"""
-        try:
-            nltk.data.find('tokenizers/punkt')
-            print("NLTK punkt tokenizer already downloaded")
-        except LookupError:
-            print("Downloading NLTK punkt tokenizer...")
-            nltk.download('punkt')
-        
-        try:
-            nltk.data.find('corpora/stopwords')
-            print("NLTK stopwords already downloaded")
-        except LookupError:
-            print("Downloading NLTK stopwords...")
-            nltk.download('stopwords')
-    
     def load_faq_data(self, faq_file=None):
-        """Load FAQ data from JSON file (default: faq_stunting.json)"""
+        """Load FAQ data from JSON file (default: faq_stunting.json).
+
+        self.faqs keeps only what matching needs (id, category, questions,
+        keywords); answers and links go to self.answers, either in memory or
+        in an on-disk store that is reused while the JSON file is unchanged.
+        The file (JSON array, {"faqs": [...]} or JSON Lines) is read
+        incrementally, so answer bodies are written to the store as they are
+        parsed instead of after the whole document is decoded.
+        """
         try:
             current_dir = os.path.dirname(os.path.abspath(__file__))
             file_name = faq_file or self.faq_file or 'faq_stunting.json'
             faq_path = os.path.join(current_dir, 'data', file_name)
+            self.source_mtime = os.stat(faq_path).st_mtime_ns
+            if self.answer_store_mode != 'memory':
+                opened = open_store(self.answer_store_dir, faq_path)
+                if opened:
+                    self._set_faqs(*opened)
+                    print(f"Loaded {len(self.faqs)} FAQ entries from answer store")
+                    return
             print(f"Loading FAQ data from: {faq_path}")
-            with open(faq_path, 'r', encoding='utf-8') as file:
-                # Support both array and dict with 'faqs' key
-                data = json.load(file)
-                if isinstance(data, dict) and 'faqs' in data:
-                    self.faqs = data['faqs']
-                else:
-                    self.faqs = data
+            # Support both array and dict with 'faqs' key, and JSON Lines
+            faqs = iter_faqs(faq_path, self.ingest_progress)
+            use_store = self.answer_store_mode == 'mmap' or (
+                self.answer_store_mode == 'auto' and os.path.getsize(faq_path) >= self.answer_store_min_bytes)
+            if use_store:
+                try:
+                    self._set_faqs(*build_store(self.answer_store_dir, faq_path, faqs))
+                    print(f"Built answer store for {file_name} in {self.answer_store_dir}")
+                except OSError as e:
+                    print(f"Warning: could not build answer store, keeping answers in memory: {e}")
+                    use_store = False
+                    faqs = iter_faqs(faq_path, self.ingest_progress)
+            if not use_store:
+                metas, bodies = [], []
+                for faq in faqs:
+                    meta, body = split_faq(faq)
+                    metas.append(meta)
+                    bodies.append(body)
+                self._set_faqs(metas, MemoryAnswerStore(bodies))
             print(f"Loaded {len(self.faqs)} FAQ entries")
         except FileNotFoundError:
             print(f"ERROR: FAQ data file not found! ({faq_file})")
-            self.faqs = []
+            self.source_mtime = None
+            self._set_faqs([], MemoryAnswerStore([]))
         except json.JSONDecodeError as e:
             print(f"ERROR: Invalid JSON format: {e}")
-            self.faqs = []
+            self.ingest_progress.update(error=str(e))
+            self._set_faqs([], MemoryAnswerStore([]))
         except Exception as e:
             print(f"ERROR: Failed to load FAQ data: {e}")
-            self.faqs = []
+            self.ingest_progress.update(error=str(e))
+            self._set_faqs([], MemoryAnswerStore([]))
+
+    def _set_faqs(self, faqs, answers):
+        self.faqs = faqs
+        self.answers = answers
+        self._faq_pos = {id(faq): i for i, faq in enumerate(faqs)}
+
+    def answer_body(self, faq):
+        """The answer/links part of an FAQ from self.faqs"""
+        pos = self._faq_pos.get(id(faq)) if faq is not None else None
+        if pos is None:
+            return {k: faq[k] for k in BODY_FIELDS if k in faq} if isinstance(faq, dict) else {}
+        return self.answers.get(pos)
+
+    def full_faq(self, faq):
+        """FAQ dict as it appears in the JSON file"""
+        merged = {k: v for k, v in faq.items() if k != LINK_TEXTS}
+        merged.update(self.answer_body(faq))
+        return merged
+
+    def all_faqs(self):
+        return [self.full_faq(faq) for faq in self.faqs]
+
+    def answer_store_stats(self):
+        info = self._template_cache.cache_info()
+        stats = self.answers.stats()
+        stats['cache'] = {'size': info.currsize, 'max_size': info.maxsize, 'hits': info.hits, 'misses': info.misses}
+        return stats
+
+    def acquire(self):
+        """Count a user of this processor; False once it was retired"""
+        with self._users_lock:
+            if self._retired:
+                return False
+            self._users += 1
+            return True
+
+    def release(self):
+        with self._users_lock:
+            self._users -= 1
+            close = self._retired and not self._users
+        if close:
+            self.answers.close()
+
+    def retire(self):
+        """Close the answer store of a processor a reload replaced, as soon
+        as no request holds it any more"""
+        with self._users_lock:
+            self._retired = True
+            close = not self._users
+        if close:
+            self.answers.close()
     def switch_faq(self, faq_file):
         """Switch FAQ data to another file and re-prepare corpus"""
         self.faq_file = faq_file
@@ -334,47 +500,48 @@ class NLPProcessor:
     
     def preprocess_text(self, text):
         """Preprocess Indonesian text"""
-        if not text:
-            return ""
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', ' ', text)
-        text = re.sub(r'\s+', ' ', text).strip()
-        try:
-            text = self.stopword_remover.remove(text)
-        except Exception as e:
-            print(f"Warning: Stopword removal failed: {e}")
-        try:
-            text = self.stemmer.stem(text)
-        except Exception as e:
-            print(f"Warning: Stemming failed: {e}")
-        
-        return text
+        return preprocess_question(text, self.stopword_remover, self.stemmer)
     
     def prepare_corpus(self):
         """Prepare corpus for TF-IDF"""
+        self._build_response_templates()
+        self.suggest_index = SuggestIndex(self.faqs)
+        self.compaction = {}
         if not self.faqs:
             print("No FAQ data available for corpus preparation")
             self.processed_questions = []
             self.question_to_faq = []
+            self.question_sources = []
             return
         
         print("Preparing corpus for TF-IDF...")
         
-        self.processed_questions = []
-        self.question_to_faq = []
+        texts = []
+        owners = []
+        tfidf = StreamingTfidf()
         
-        for faq in self.faqs:
-            for question in faq['questions']:
-                processed_q = self.preprocess_text(question)
-                if processed_q:
-                    self.processed_questions.append(processed_q)
-                    self.question_to_faq.append(faq)
+        # questions are preprocessed and counted chunk by chunk (optionally in
+        # INGEST_WORKERS processes); only sparse counts are kept per chunk
+        for chunk_texts, chunk_owners in preprocess_questions(
+                self.faqs, self.preprocess_text, self.ingest_chunk_size, self.ingest_workers, self.ingest_progress):
+            texts.extend(chunk_texts)
+            owners.extend(chunk_owners)
+            tfidf.add(chunk_texts)
+        
+        # questions that preprocess to the same text are scored once;
+        # question_sources keeps the FAQ ids each one came from
+        keep, self.question_sources, self.compaction['questions'] = compact_questions(texts, owners)
+        self.processed_questions = [texts[i] for i in keep]
+        self.question_to_faq = [owners[i] for i in keep]
         
-        print(f"Processed {len(self.processed_questions)} questions")
+        print(f"Processed {len(texts)} questions, {len(keep)} unique after compaction")
         
         if self.processed_questions:
             try:
-                self.tfidf_matrix = self.vectorizer.fit_transform(self.processed_questions)
+                self.ingest_progress.update(stage='vectorizing')
+                # IDF is still fitted on every question so scores do not shift
+                self.vectorizer, matrix = tfidf.finish()
+                self.tfidf_matrix = matrix if len(keep) == len(texts) else matrix[keep]
                 print("TF-IDF matrix created successfully")
             except Exception as e:
                 print(f"ERROR: Failed to create TF-IDF matrix: {e}")
@@ -382,6 +549,69 @@ class NLPProcessor:
         else:
             self.tfidf_matrix = None
     
+    def _compact_keywords(self):
+        """Remove unreachable duplicate category keywords and report the savings"""
+        self.keyword_sources, self.compaction['keywords'] = compact_keywords(self.ppid_categories, self.keyword_to_faq)
+        q, k = self.compaction.get('questions'), self.compaction['keywords']
+        if q:
+            print(f"Compaction: questions {q['before']} -> {q['after']}, keywords {k['before']} -> {k['after']}")
+        else:
+            print(f"Compaction: keywords {k['before']} -> {k['after']}")
+
+    def _build_response_templates(self):
+        """Set up pre-rendered response bodies.
+
+        FAQ templates are rendered from the answer store on first use and kept
+        in an LRU cache of answer_cache_size FAQs, so only frequently answered
+        bodies stay resident. The fallback answers are rendered once, so per
+        request only confidence and status are filled in.
+        """
+        self._template_cache = lru_cache(maxsize=self.answer_cache_size)(self._render_templates)
+
+        self.fallback_templates = {}
+        for key, lines in (('ppid', PPID_FALLBACK_ANSWERS), ('default', STUNTING_FALLBACK_ANSWERS)):
+            self.fallback_templates[key] = PayloadTemplate({
+                'answer': "\n".join(lines),
+                'category': 'unknown',
+                'faq_id': None
+            })
+
+    def response_templates(self, faq):
+        """Templates of an FAQ from self.faqs, or None"""
+        pos = self._faq_pos.get(id(faq)) if faq is not None else None
+        return self._template_cache(pos) if pos is not None else None
+
+    def _render_templates(self, pos):
+        """A 'match' template (TF-IDF hit, includes formatted_answer when links
+        exist) and a 'keyword' template (category keyword hit) for FAQ `pos`.
+        """
+        faq = self.faqs[pos]
+        body = self.answers.get(pos)
+        links = body.get('links')
+        match_fields = {
+            'answer': body.get('answer'),
+            'category': faq.get('category'),
+            'faq_id': faq.get('id')
+        }
+        if links:
+            formatted_answer = body.get('answer') or ''
+            formatted_answer += "\n\nLink terkait:"
+            for link in links:
+                formatted_answer += f"\n• {link['text']}: {link['url']}"
+            match_fields['links'] = links
+            match_fields['formatted_answer'] = formatted_answer
+        templates = {'match': PayloadTemplate(match_fields)}
+        if 'answer' in body:
+            keyword_fields = {
+                'answer': body['answer'],
+                'category': faq.get('category', 'ppid_informasi'),
+                'faq_id': faq.get('id')
+            }
+            if links:
+                keyword_fields['links'] = links
+            templates['keyword'] = PayloadTemplate(keyword_fields)
+        return templates
+
     def find_best_answer(self, user_question, threshold=None):
         """Find the best answer for user question.
 
@@ -398,6 +628,9 @@ class NLPProcessor:
             return None, 0
 
         try:
+            fuzz = _fuzz()
+            np = _np()
+            cosine_similarity = lazy_import('sklearn.metrics.pairwise').cosine_similarity
             user_tfidf = self.vectorizer.transform([processed_user_q])
             similarities = cosine_similarity(user_tfidf, self.tfidf_matrix).flatten()
             fuzzy_scores = []
@@ -405,7 +638,7 @@ class NLPProcessor:
                 fuzzy_score = fuzz.ratio(processed_user_q, q) / 100.0
                 fuzzy_scores.append(fuzzy_score)
 
-            combined_scores = 0.7 * similarities + 0.3 * np.array(fuzzy_scores)
+            combined_scores = self.tfidf_weight * similarities + self.fuzzy_weight * np.array(fuzzy_scores)
             best_idx = int(np.argmax(combined_scores))
             best_score = float(combined_scores[best_idx])
 
@@ -424,20 +657,28 @@ class NLPProcessor:
         """Generate response for PPID information query"""
         # if check_ppid_category attached an originating faq, prefer that faq's exact answer/links
         faq_obj = ppid_info.get('faq') if isinstance(ppid_info, dict) else None
+        templates = self.response_templates(faq_obj) if faq_obj else None
+        if templates and 'keyword' in templates:
+            return templates['keyword'].render(0.95, 'found')
         if faq_obj:
+            body = self.answer_body(faq_obj)
+            if 'answer' in body:
+                answer = body['answer']
+            else:
+                answer = self.category_description(ppid_info['category']) + ' dapat ditemukan di'
             resp = {
-                'answer': faq_obj.get('answer', ppid_info.get('description', '') + ' dapat ditemukan di'),
+                'answer': answer,
                 'confidence': 0.95,
                 'category': faq_obj.get('category', 'ppid_informasi'),
                 'faq_id': faq_obj.get('id'),
                 'status': 'found'
             }
-            if faq_obj.get('links'):
-                resp['links'] = faq_obj.get('links')
+            if body.get('links'):
+                resp['links'] = body.get('links')
             return resp
 
         return {
-            'answer': f"{ppid_info['description']} dapat ditemukan di",
+            'answer': f"{self.category_description(ppid_info['category'])} dapat ditemukan di",
             'confidence': 0.95,
             'category': 'ppid_informasi',
             'faq_id': ppid_info['category'],
@@ -454,75 +695,51 @@ class NLPProcessor:
         print(f"Processing question: {user_question}")
         
         # Check for PPID information categories first
-        ppid_info = self.check_ppid_category(user_question)
-        if ppid_info:
-            print(f"PPID category detected: {ppid_info['category']} (keyword: {ppid_info['matched_keyword']})")
-            return self.generate_ppid_response(ppid_info)
+        if self.category_source is None:
+            ppid_response = self.keyword_response(user_question)
+        else:
+            with in_use(self.category_source) as source:
+                ppid_response = source.keyword_response(user_question)
+        if ppid_response:
+            return ppid_response
         
         # Continue with regular FAQ matching
         best_faq, confidence = self.find_best_answer(user_question)
         if best_faq:
-            response = {
-                'answer': best_faq['answer'],
-                'confidence': float(confidence),
-                'category': best_faq['category'],
-                'faq_id': best_faq['id'],
-                'status': 'found'
-            }
-            
-            # Include links if available
-            if 'links' in best_faq and best_faq['links']:
-                response['links'] = best_faq['links']
-                
-                # Optional: Format answer with clickable links for HTML display
-                formatted_answer = best_faq['answer']
-                if best_faq['links']:
-                    formatted_answer += "\n\nLink terkait:"
-                    for link in best_faq['links']:
-                        formatted_answer += f"\n• {link['text']}: {link['url']}"
-                
-                response['formatted_answer'] = formatted_answer
+            templates = self.response_templates(best_faq)
+            if templates:
+                response = templates['match'].render(float(confidence), 'found')
+            else:
+                response = {
+                    'answer': self.answer_body(best_faq)['answer'],
+                    'confidence': float(confidence),
+                    'category': best_faq['category'],
+                    'faq_id': best_faq['id'],
+                    'status': 'found'
+                }
             
             print(f"Answer found with confidence: {confidence:.3f}")
             if 'links' in response:
                 print(f"Including {len(response['links'])} links in response")
         else:
-            # Fallback sesuai env
-            env_key = env or self.faq_file.replace('.json','')
-            if 'ppid' in env_key:
-                fallback_answers = [
-                    "Maaf, saya tidak dapat menemukan jawaban yang tepat untuk pertanyaan Anda.",
-                    "Berikut beberapa topik yang bisa saya bantu:",
-                    "• Apa itu PPID?",
-                    "• Cara permohonan informasi publik",
-                    "• Prosedur pengajuan keberatan",
-                    "• Jenis informasi publik",
-                    "• Layanan website PPID",
-                    "• Kontak dan alamat PPID",
-                    "",
-                    "Silakan ajukan pertanyaan dengan kata kunci yang lebih spesifik, atau hubungi petugas PPID untuk informasi lebih lanjut."
-                ]
-            else:
-                fallback_answers = [
-                    "Maaf, saya tidak dapat menemukan jawaban yang tepat untuk pertanyaan Anda.",
-                    "Berikut beberapa topik yang bisa saya bantu:",
-                    "• Apa itu stunting?",
-                    "• Penyebab dan cara mencegah stunting",
-                    "• Gizi ibu hamil dan ASI eksklusif", 
-                    "• MPASI dan nutrisi anak",
-                    "• Imunisasi dan posyandu",
-                    "",
-                    "Silakan ajukan pertanyaan dengan kata kunci yang lebih spesifik, atau hubungi petugas kesehatan untuk informasi lebih lanjut."
-                ]
-            response = {
-                'answer': "\n".join(fallback_answers),
-                'confidence': float(confidence),
-                'category': 'unknown',
-                'faq_id': None,
-                'status': 'not_found'
-            }
+            response = self.fallback_response(env, confidence)
             print(f"No suitable answer found. Confidence: {confidence:.3f}")
         return response
+
+    def keyword_response(self, user_question):
+        """The PPID category response for a question naming a category, else None"""
+        ppid_info = self.check_ppid_category(user_question)
+        if ppid_info:
+            print(f"PPID category detected: {ppid_info['category']} (keyword: {ppid_info['matched_keyword']})")
+            return self.generate_ppid_response(ppid_info)
+        return None
+
+    def fallback_response(self, env=None, confidence=0.0):
+        """The env's canned not_found answer"""
+        # Fallback sesuai env
+        env_key = env or self.faq_file.replace('.json','')
+        template = self.fallback_templates['ppid' if 'ppid' in env_key else 'default']
+        return template.render(float(confidence), 'not_found')
     
     def get_all_categories(self):
         """Get all available categories"""
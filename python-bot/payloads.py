@@ -0,0 +1,85 @@
+import json
+import math
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, plain json works the same
+    orjson = None
+
+
+def encode_json(obj):
+    """Encode obj to compact UTF-8 JSON bytes, using orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# confidence/status are the only per-request fields; statuses come from a
+# small fixed set so their encodings are cached as they are first seen.
+_STATUS_BYTES = {}
+
+
+def _status_bytes(status):
+    encoded = _STATUS_BYTES.get(status)
+    if encoded is None:
+        encoded = encode_json(status)
+        if isinstance(status, str):
+            _STATUS_BYTES[status] = encoded
+    return encoded
+
+
+class PrerenderedResponse(dict):
+    """Response dict whose static fields were JSON-encoded ahead of time.
+
+    It behaves like the plain dicts get_response() always returned, but also
+    carries `prefix`: the encoded body up to the `confidence` value. to_json()
+    only has to splice in the current confidence and status; if keys were
+    added after rendering it falls back to encoding the whole dict.
+    """
+
+    __slots__ = ('prefix', 'size')
+
+    def copy(self):
+        clone = PrerenderedResponse(self)
+        clone.prefix = self.prefix
+        clone.size = self.size
+        return clone
+
+    def to_json(self):
+        if len(self) != self.size:
+            return encode_json(dict(self))
+        confidence = self.get('confidence', 0.0)
+        try:
+            confidence = float(confidence)
+        except (TypeError, ValueError):
+            confidence = 0.0
+        if not math.isfinite(confidence):
+            confidence = 0.0
+        return b''.join((
+            self.prefix,
+            repr(confidence).encode('ascii'),
+            b',"status":',
+            _status_bytes(self.get('status')),
+            b'}'
+        ))
+
+
+class PayloadTemplate:
+    """Static part of a response, rendered once when the index is built."""
+
+    __slots__ = ('fields', 'prefix')
+
+    def __init__(self, fields):
+        self.fields = fields
+        static = encode_json(fields)
+        # '{...}' -> '{...,"confidence":'
+        self.prefix = static[:-1] + (b',"confidence":' if fields else b'"confidence":')
+
+    def render(self, confidence, status):
+        """Return a PrerenderedResponse with the per-request fields filled in."""
+        resp = PrerenderedResponse(self.fields)
+        resp['confidence'] = confidence
+        resp['status'] = status
+        resp.prefix = self.prefix
+        resp.size = len(resp)
+        return resp
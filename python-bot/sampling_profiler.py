@@ -0,0 +1,196 @@
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """Low-overhead sampling profiler for selected requests.
+
+    A daemon thread wakes every `interval` seconds while at least one
+    profiled request is running, reads that request thread's current stack
+    via sys._current_frames() and counts it under (endpoint, env). Requests
+    are not instrumented otherwise, so unprofiled requests pay only for the
+    should_profile() check.
+
+    A request is profiled when it carries a valid admin token header, when a
+    profiling window opened with start_window() is active, or at random with
+    probability `sample_rate`. Results are exported as collapsed stacks
+    (flamegraph.pl / speedscope import) or speedscope JSON.
+    """
+
+    def __init__(self, interval=0.005, sample_rate=0.0, token=None, out_dir=None, max_depth=64):
+        self.interval = float(interval)
+        self.sample_rate = float(sample_rate)
+        self.token = token or None
+        self.out_dir = out_dir
+        self.max_depth = int(max_depth)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._active = {}
+        self._stacks = {}
+        self._window_until = 0.0
+        self._window_rate = None
+        self._thread = None
+        self.profiled_requests = 0
+        self.samples = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a profiler from PROFILER_* environment variables."""
+        return cls(
+            interval=float(os.environ.get('PROFILER_INTERVAL_MS', '5')) / 1000.0,
+            sample_rate=float(os.environ.get('PROFILER_SAMPLE_RATE', '0')),
+            token=os.environ.get('PROFILER_TOKEN'),
+            out_dir=os.environ.get('PROFILER_DIR') or os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), 'profiles')
+        )
+
+    def check_token(self, supplied):
+        """True when an admin token is configured and `supplied` matches it."""
+        if not self.token or not supplied:
+            return False
+        return hmac.compare_digest(str(supplied), self.token)
+
+    def should_profile(self, supplied_token=None):
+        if supplied_token and self.check_token(supplied_token):
+            return True
+        rate = self.sample_rate
+        if self._window_until and time.monotonic() < self._window_until:
+            if self._window_rate is None:
+                return True
+            rate = self._window_rate
+        return rate > 0 and random.random() < rate
+
+    def start_window(self, seconds, sample_rate=None):
+        """Profile every request for the next `seconds`, or only a `sample_rate`
+        fraction of them. The configured sample_rate applies again afterwards."""
+        self._window_rate = None if sample_rate is None else float(sample_rate)
+        self._window_until = time.monotonic() + float(seconds)
+
+    def stop_window(self):
+        self._window_until = 0.0
+        self._window_rate = None
+
+    def begin(self, endpoint, env):
+        """Start sampling the calling thread for this request."""
+        with self._lock:
+            self._active[threading.get_ident()] = (endpoint or 'unknown', env or '-')
+            self.profiled_requests += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def end(self):
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def _frame_label(self, frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        while True:
+            # clear before checking, so a begin() in between still wakes us
+            self._wake.clear()
+            if not self._active:
+                self._wake.wait()
+            with self._lock:
+                active = dict(self._active)
+            frames = sys._current_frames()
+            for tid, key in active.items():
+                frame = frames.get(tid)
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    stack.append(self._frame_label(frame))
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                collapsed = ';'.join(reversed(stack))
+                with self._lock:
+                    self._stacks.setdefault(key, Counter())[collapsed] += 1
+                    self.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+    def _select(self, endpoint=None, env=None):
+        with self._lock:
+            return {k: Counter(v) for k, v in self._stacks.items()
+                    if (endpoint is None or k[0] == endpoint) and (env is None or k[1] == env)}
+
+    def collapsed(self, endpoint=None, env=None):
+        """Collapsed-stack text, one 'endpoint;env;frame;...;frame count' per line."""
+        lines = []
+        for (ep, ev), stacks in sorted(self._select(endpoint, env).items()):
+            for stack, count in stacks.most_common():
+                lines.append(f"{ep};{ev};{stack} {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def speedscope(self, endpoint=None, env=None):
+        """speedscope.app file format, one sampled profile per (endpoint, env)."""
+        frames, index = [], {}
+        profiles = []
+        step = self.interval * 1000.0
+        for (ep, ev), stacks in sorted(self._select(endpoint, env).items()):
+            samples, weights = [], []
+            for stack, count in stacks.most_common():
+                ids = []
+                for label in stack.split(';'):
+                    if label not in index:
+                        index[label] = len(frames)
+                        frames.append({'name': label})
+                    ids.append(index[label])
+                samples.append(ids)
+                weights.append(count * step)
+            profiles.append({
+                'type': 'sampled',
+                'name': f"{ep} [{ev}]",
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights
+            })
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': profiles,
+            'name': 'python-bot sampling profile',
+            'exporter': 'sampling_profiler'
+        }
+
+    def dump(self):
+        """Write collapsed and speedscope files to out_dir; returns their paths."""
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        base = os.path.join(self.out_dir, f"profile-{stamp}-{os.getpid()}")
+        with open(base + '.collapsed.txt', 'w', encoding='utf-8') as fh:
+            fh.write(self.collapsed())
+        with open(base + '.speedscope.json', 'w', encoding='utf-8') as fh:
+            json.dump(self.speedscope(), fh)
+        return [base + '.collapsed.txt', base + '.speedscope.json']
+
+    def reset(self):
+        with self._lock:
+            self._stacks = {}
+            self.samples = 0
+            self.profiled_requests = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled_by_token': bool(self.token),
+                'sample_rate': self.sample_rate,
+                'window_active': bool(self._window_until and time.monotonic() < self._window_until),
+                'window_sample_rate': self._window_rate,
+                'interval_ms': self.interval * 1000.0,
+                'profiled_requests': self.profiled_requests,
+                'samples': self.samples,
+                'profiles': len(self._stacks),
+                'active': len(self._active)
+            }
@@ -0,0 +1,186 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+from nlp_processor import in_use
+
+
+class _EnvStats:
+    def __init__(self):
+        self.compared = 0
+        self.agreed = 0
+        self.score_delta_sum = 0.0
+        self.score_delta_abs_sum = 0.0
+        self.latency_delta_sum = 0.0
+        self.prod_latency_sum = 0.0
+        self.shadow_latency_sum = 0.0
+        self.cpu_compared = 0
+        self.prod_cpu_sum = 0.0
+        self.shadow_cpu_sum = 0.0
+        self.errors = 0
+
+    def as_dict(self):
+        n = self.compared or 1
+        c = self.cpu_compared or 1
+        return {
+            'compared': self.compared,
+            'agreement_rate': round(self.agreed / n, 4) if self.compared else None,
+            'mean_score_delta': round(self.score_delta_sum / n, 4),
+            'mean_abs_score_delta': round(self.score_delta_abs_sum / n, 4),
+            'mean_prod_latency_ms': round(self.prod_latency_sum / n * 1000, 2),
+            'mean_shadow_latency_ms': round(self.shadow_latency_sum / n * 1000, 2),
+            'mean_latency_delta_ms': round(self.latency_delta_sum / n * 1000, 2),
+            'mean_prod_cpu_ms': round(self.prod_cpu_sum / c * 1000, 2),
+            'mean_shadow_cpu_ms': round(self.shadow_cpu_sum / c * 1000, 2),
+            'mean_cpu_delta_ms': round((self.shadow_cpu_sum - self.prod_cpu_sum) / c * 1000, 2),
+            'errors': self.errors
+        }
+
+
+class ShadowScorer:
+    """Run a candidate matcher configuration alongside production.
+
+    A sample of live questions is queued after the production response has
+    been computed; a background thread answers them again with a candidate
+    NLPProcessor built from `config` (any NLPProcessor keyword argument, e.g.
+    match_threshold, fuzzy_threshold, tfidf_weight, fuzzy_weight) and
+    records agreement, score and latency deltas per environment. The queue
+    is bounded and drops work when full, so requests never wait for it.
+
+    The shadow thread still shares the GIL with request threads: under load
+    its scoring competes with them for CPU, and wall-clock latencies of both
+    sides include that contention. CPU time (time.thread_time()) of each
+    side is recorded as well and is the figure to compare under load.
+
+    Candidates are cached per `source_key(env)`; app.py passes the env's FAQ
+    file, so envs answered from the same file share one candidate.
+    """
+
+    def __init__(self, processor_factory, config=None, sample_rate=0.1, max_queue=100, keep_disagreements=20,
+                 source_key=None):
+        self.processor_factory = processor_factory
+        self.source_key = source_key or (lambda env: env)
+        self.config = dict(config or {})
+        self.enabled = bool(self.config)
+        self.sample_rate = float(sample_rate)
+        self._queue = queue.Queue(maxsize=int(max_queue))
+        self._candidates = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.dropped = 0
+        self.disagreements = deque(maxlen=int(keep_disagreements))
+
+    @classmethod
+    def from_env(cls, processor_factory, source_key=None):
+        """Build a shadow scorer from SHADOW_* environment variables.
+
+        SHADOW_CONFIG holds the candidate's NLPProcessor arguments as JSON;
+        shadow mode is off when it is not set.
+        """
+        config = {}
+        raw = os.environ.get('SHADOW_CONFIG')
+        if raw:
+            try:
+                config = json.loads(raw)
+            except Exception as e:
+                print(f"Warning: invalid SHADOW_CONFIG, shadow mode disabled: {e}")
+        return cls(
+            processor_factory,
+            config=config,
+            sample_rate=float(os.environ.get('SHADOW_SAMPLE_RATE', '0.1')),
+            max_queue=int(os.environ.get('SHADOW_MAX_QUEUE', '100')),
+            source_key=source_key
+        )
+
+    def submit(self, env, question, prod_response, prod_latency, prod_cpu=None):
+        """Queue a production answer for comparison; never blocks.
+
+        prod_latency is wall-clock seconds, prod_cpu (optional) the CPU
+        seconds the request thread spent computing the answer.
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((env, question, prod_response, prod_latency, prod_cpu))
+        except queue.Full:
+            self.dropped += 1
+
+    def candidate(self, env):
+        """The candidate processor for an env, built on first use"""
+        key = self.source_key(env)
+        candidate = self._candidates.get(key)
+        if candidate is None:
+            candidate = self._candidates[key] = self.processor_factory(env, self.config)
+        return candidate
+
+    def invalidate(self, source):
+        """Drop the cached candidate for a source (FAQ file) so the next
+        comparison builds it from the current data. Its answer store is
+        closed once a comparison still running on it is done."""
+        candidate = self._candidates.pop(source, None)
+        if candidate is not None:
+            candidate.retire()
+
+    def _run(self):
+        while True:
+            env, question, prod, prod_latency, prod_cpu = self._queue.get()
+            with self._lock:
+                stats = self._stats.setdefault(env, _EnvStats())
+            try:
+                with in_use(lambda: self.candidate(env)) as candidate:
+                    start, start_cpu = time.perf_counter(), time.thread_time()
+                    shadow = candidate.get_response(question, env=env)
+                    shadow_latency = time.perf_counter() - start
+                    shadow_cpu = time.thread_time() - start_cpu
+            except Exception as e:
+                print(f"Warning: shadow scoring failed for {env}: {e}")
+                with self._lock:
+                    stats.errors += 1
+                continue
+
+            agreed = (prod.get('status'), prod.get('faq_id')) == (shadow.get('status'), shadow.get('faq_id'))
+            delta = float(shadow.get('confidence', 0.0)) - float(prod.get('confidence', 0.0))
+            with self._lock:
+                stats.compared += 1
+                stats.agreed += int(agreed)
+                stats.score_delta_sum += delta
+                stats.score_delta_abs_sum += abs(delta)
+                stats.prod_latency_sum += prod_latency
+                stats.shadow_latency_sum += shadow_latency
+                stats.latency_delta_sum += shadow_latency - prod_latency
+                if prod_cpu is not None:
+                    stats.cpu_compared += 1
+                    stats.prod_cpu_sum += prod_cpu
+                    stats.shadow_cpu_sum += shadow_cpu
+                if not agreed:
+                    self.disagreements.append({
+                        'env': env,
+                        'question': question,
+                        'prod': {'status': prod.get('status'), 'faq_id': prod.get('faq_id'),
+                                 'confidence': prod.get('confidence')},
+                        'shadow': {'status': shadow.get('status'), 'faq_id': shadow.get('faq_id'),
+                                   'confidence': shadow.get('confidence')}
+                    })
+
+    def stats(self):
+        """Per-environment comparison results and recent disagreements."""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'config': self.config,
+                'sample_rate': self.sample_rate,
+                'queued': self._queue.qsize(),
+                'dropped': self.dropped,
+                'envs': {env: s.as_dict() for env, s in self._stats.items()},
+                'recent_disagreements': list(self.disagreements)
+            }
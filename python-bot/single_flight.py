@@ -0,0 +1,87 @@
+import threading
+
+
+class _Call:
+    """A single in-flight computation that concurrent callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent identical requests into one computation.
+
+    The first caller for a key runs the function; callers arriving with the
+    same key while it is still running block until it finishes and share its
+    result (or its exception). Nothing is kept once the call completes, so
+    this is not a cache: a request arriving after the first one returned
+    computes again. Only threads of one process are coalesced, so gunicorn
+    needs threaded workers (gthread) for this to take effect.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(env, question):
+        """Build the coalescing key from env and the question.
+
+        Only case and surrounding whitespace are folded: that is all
+        get_response() ignores. Keyword matching works on the raw lowercased
+        text, so punctuation or inner spacing can change the answer and
+        questions differing in them must not share a result.
+        """
+        return ((env or '').lower(), (question or '').strip().lower())
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) once per in-flight key.
+
+        Returns a tuple (result, shared) where shared is True when the result
+        was produced by another caller's computation.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        """Return counters describing coalescing activity."""
+        with self._lock:
+            in_flight = len(self._calls)
+            waiting = sum(c.waiters for c in self._calls.values())
+        return {
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'in_flight': in_flight,
+            'waiting': waiting
+        }
@@ -0,0 +1,83 @@
+"""Startup timing for the bot: deferred imports and init stages.
+
+Heavy libraries (scikit-learn, numpy, Sastrawi, fuzzywuzzy) are imported
+through lazy_import() the first time they are needed, and NLPProcessor
+wraps each init step in stage(). Both are recorded here so a per-import and
+per-stage report can be printed on demand:
+
+    BOT_STARTUP_PROFILE=1 python app.py
+    python startup_profile.py [faq_file]
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_modules = {}
+_imports = []
+_stages = []
+
+
+def lazy_import(name):
+    """Import a module on first use and record how long it took."""
+    module = _modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        module = _modules.get(name)
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(name)
+            _imports.append((name, time.perf_counter() - start))
+            _modules[name] = module
+    return module
+
+
+@contextmanager
+def stage(name):
+    """Record the duration of an initialization stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _stages.append((name, time.perf_counter() - start))
+
+
+def snapshot():
+    """Return recorded timings in seconds as a JSON-friendly dict."""
+    with _lock:
+        return {
+            'imports': [{'module': n, 'seconds': round(t, 4)} for n, t in _imports],
+            'stages': [{'stage': n, 'seconds': round(t, 4)} for n, t in _stages]
+        }
+
+
+def report():
+    """Format the recorded timings as a human-readable table."""
+    data = snapshot()
+    lines = ['=== Startup profile ===', 'Deferred imports:']
+    for item in data['imports']:
+        lines.append(f"  {item['seconds'] * 1000:9.1f} ms  {item['module']}")
+    lines.append('Init stages:')
+    for item in data['stages']:
+        lines.append(f"  {item['seconds'] * 1000:9.1f} ms  {item['stage']}")
+    return "\n".join(lines)
+
+
+def enabled():
+    """True when BOT_STARTUP_PROFILE asks for the report to be printed."""
+    return os.environ.get('BOT_STARTUP_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+
+if __name__ == '__main__':
+    # record into the importable module, which nlp_processor also uses
+    import startup_profile as profile
+    with profile.stage('import nlp_processor'):
+        from nlp_processor import NLPProcessor
+    with profile.stage('NLPProcessor() total'):
+        NLPProcessor(faq_file=sys.argv[1] if len(sys.argv) > 1 else None)
+    print(profile.report())
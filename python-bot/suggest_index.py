@@ -0,0 +1,108 @@
+import bisect
+import re
+from collections import Counter
+
+
+def normalize_text(text):
+    """Lower-case, strip punctuation and collapse whitespace."""
+    text = (text or '').lower()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class SuggestIndex:
+    """Prefix index over FAQ questions and keywords for autocomplete.
+
+    Every normalized question/keyword is stored in a sorted array once per
+    word it contains (the text from that word to the end), so a typed prefix
+    matches the start of any word, not only the start of the question. A
+    lookup is a bisect plus a bounded scan, ranked by how often each FAQ has
+    been answered.
+    """
+
+    def __init__(self, faqs, max_scan=400):
+        self.max_scan = int(max_scan)
+        self.entries = []
+        self.popularity = Counter()
+        seen = set()
+        for faq in faqs or []:
+            texts = [('question', q) for q in faq.get('questions') or []]
+            texts += [('keyword', k) for k in faq.get('keywords') or []]
+            for kind, text in texts:
+                if not isinstance(text, str):
+                    continue
+                norm = normalize_text(text)
+                if not norm or norm in seen:
+                    continue
+                seen.add(norm)
+                self.entries.append({
+                    'text': text.strip(),
+                    'normalized': norm,
+                    'faq_id': faq.get('id'),
+                    'category': faq.get('category'),
+                    'kind': kind
+                })
+
+        keys = []
+        for idx, entry in enumerate(self.entries):
+            norm = entry['normalized']
+            keys.append((norm, idx))
+            for m in re.finditer(r' ', norm):
+                keys.append((norm[m.end():], idx))
+        keys.sort()
+        self._keys = [k for k, _ in keys]
+        self._ids = [i for _, i in keys]
+
+    def record_hit(self, faq_id):
+        """Count an answered question towards its FAQ's popularity."""
+        if faq_id is not None:
+            self.popularity[faq_id] += 1
+
+    def set_popularity(self, counts):
+        """Replace the popularity with answered counts keyed by str(faq_id),
+        as AnalyticsAggregator.faq_hits() reports them."""
+        ids = {str(e['faq_id']): e['faq_id'] for e in self.entries if e['faq_id'] is not None}
+        self.popularity = Counter({ids[k]: n for k, n in counts.items() if k in ids})
+
+    def suggest(self, query, limit=5):
+        """Return up to `limit` entries whose words start with the query."""
+        prefix = normalize_text(query)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self._keys, prefix)
+        candidates = {}
+        end = min(len(self._keys), start + self.max_scan)
+        for pos in range(start, end):
+            key = self._keys[pos]
+            if not key.startswith(prefix):
+                break
+            idx = self._ids[pos]
+            # whole-text prefix matches beat matches in the middle
+            at_start = len(key) == len(self.entries[idx]['normalized'])
+            if idx not in candidates or at_start:
+                candidates[idx] = at_start
+
+        def rank(idx):
+            entry = self.entries[idx]
+            return (-self.popularity.get(entry['faq_id'], 0),
+                    not candidates[idx],
+                    entry['kind'] != 'question',
+                    len(entry['normalized']))
+
+        results = []
+        faq_seen = set()
+        for idx in sorted(candidates, key=rank):
+            entry = self.entries[idx]
+            # one suggestion per FAQ; several phrasings of it add nothing
+            faq_key = entry['faq_id'] if entry['faq_id'] is not None else ('entry', idx)
+            if faq_key in faq_seen:
+                continue
+            faq_seen.add(faq_key)
+            results.append({
+                'text': entry['text'],
+                'faq_id': entry['faq_id'],
+                'category': entry['category']
+            })
+            if len(results) >= limit:
+                break
+        return results
@@ -0,0 +1,92 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from ingest import _iter_json_array, iter_faqs
+
+FAQS = [
+    {'id': 1, 'questions': ['Apa itu stunting?', 'kurang gizi [kronis]'], 'answer': 'Gagal tumbuh {anak} "balita"'},
+    {'id': 2, 'questions': ['Bagaimana mencegahnya?'], 'answer': 'Gizi seimbang – ASI eksklusif \U0001f476', 'score': 12345.678},
+    {'id': 30, 'questions': [], 'answer': '', 'links': [{'url': 'https://example.go.id/a?b=1,2'}]},
+]
+
+
+def parse(text, chunk_size=1 << 20, encoding='utf-8'):
+    data = text.encode(encoding) if isinstance(text, str) else text
+    return list(_iter_json_array(io.BytesIO(data), None, chunk_size))
+
+
+class IterJsonArrayTest(unittest.TestCase):
+
+    def test_array(self):
+        self.assertEqual(parse(json.dumps(FAQS)), FAQS)
+
+    def test_chunk_boundaries(self):
+        # every chunk size splits strings, numbers and multibyte characters somewhere
+        for doc in (json.dumps(FAQS), json.dumps(FAQS, indent=2, ensure_ascii=False)):
+            for chunk_size in range(1, 40):
+                with self.subTest(chunk_size=chunk_size):
+                    self.assertEqual(parse(doc, chunk_size), FAQS)
+
+    def test_numbers_at_chunk_end(self):
+        self.assertEqual(parse('[1, 23, 456.5e2]', chunk_size=2), [1, 23, 456.5e2])
+        self.assertEqual(parse('[12345]', chunk_size=3), [12345])
+
+    def test_object_with_leading_keys(self):
+        doc = json.dumps({'meta': {'faqs': [0], 'version': [1, 2]}, 'title': 'x]', 'faqs': FAQS, 'after': 1})
+        for chunk_size in (1, 7, 1 << 20):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(parse(doc, chunk_size), FAQS)
+
+    def test_object_without_faqs(self):
+        with self.assertRaises(ValueError):
+            parse('{"meta": 1}')
+
+    def test_bom(self):
+        self.assertEqual(parse('﻿' + json.dumps(FAQS)), FAQS)
+        self.assertEqual(parse('﻿  {"faqs": [{"id": 1}]}', chunk_size=1), [{'id': 1}])
+
+    def test_empty_array(self):
+        for doc in ('[]', ' [ ]\n', '﻿[]', '{"faqs": []}'):
+            with self.subTest(doc=doc):
+                self.assertEqual(parse(doc, chunk_size=1), [])
+
+    def test_empty_input(self):
+        for doc in ('', '   \n', '﻿'):
+            with self.subTest(doc=doc):
+                with self.assertRaises(json.JSONDecodeError):
+                    parse(doc)
+
+    def test_unterminated(self):
+        with self.assertRaises(json.JSONDecodeError):
+            parse('[{"id": 1}, {"id": 2}', chunk_size=4)
+
+
+class IterFaqsTest(unittest.TestCase):
+
+    def write(self, name, text):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(text)
+        return path
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_json_lines(self):
+        path = self.write('faq_x.jsonl', '\n'.join(json.dumps(f) for f in FAQS) + '\n\n')
+        self.assertEqual(list(iter_faqs(path)), FAQS)
+
+    def test_empty_file_array(self):
+        self.assertEqual(list(iter_faqs(self.write('faq_x.json', '[]'), chunk_size=1)), [])
+
+    def test_non_object_entries(self):
+        with self.assertRaises(ValueError):
+            list(iter_faqs(self.write('faq_x.json', '[1]')))
+
+
+if __name__ == '__main__':
+    unittest.main()
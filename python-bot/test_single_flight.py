@@ -0,0 +1,68 @@
+import threading
+import unittest
+
+from single_flight import SingleFlight
+
+
+class MakeKeyTest(unittest.TestCase):
+
+    def test_case_and_surrounding_whitespace_coalesce(self):
+        self.assertEqual(SingleFlight.make_key('PPID', '  Apa itu PPID?\n'),
+                         SingleFlight.make_key('ppid', 'apa itu ppid?'))
+
+    def test_punctuation_and_inner_spacing_do_not(self):
+        self.assertNotEqual(SingleFlight.make_key('ppid', 'mpasi'), SingleFlight.make_key('ppid', 'mpasi?'))
+        self.assertNotEqual(SingleFlight.make_key('ppid', 'apa itu ppid'), SingleFlight.make_key('ppid', 'apa  itu ppid'))
+
+
+class PunctuationVariantsTest(unittest.TestCase):
+    """Keyword matching sees the raw lowercased text, so these variants get
+    different answers and must never share one."""
+
+    QUESTIONS = ('mpasi', 'mpasi?')
+
+    @classmethod
+    def setUpClass(cls):
+        from nlp_processor import NLPProcessor
+        cls.processor = NLPProcessor(faq_file='faq_ppid.json', answer_store='memory')
+
+    def answer(self, question):
+        response = self.processor.get_response(question, env='ppid')
+        return response.get('faq_id'), response.get('status')
+
+    def test_variants_resolve_differently(self):
+        self.assertNotEqual(*[self.answer(q) for q in self.QUESTIONS])
+
+    def test_concurrent_variants_get_their_own_answer(self):
+        flight = SingleFlight()
+        leader_running = threading.Event()
+        release = threading.Event()
+
+        def compute(question):
+            if question == self.QUESTIONS[0]:
+                leader_running.set()
+                release.wait(5)
+            return self.answer(question)
+
+        results = {}
+
+        def ask(question):
+            results[question] = flight.do(SingleFlight.make_key('ppid', question), compute, question)
+
+        first = threading.Thread(target=ask, args=(self.QUESTIONS[0],))
+        first.start()
+        leader_running.wait(5)
+        # arrives while the first computation is still in flight
+        second = threading.Thread(target=ask, args=(self.QUESTIONS[1],))
+        second.start()
+        second.join(5)
+        release.set()
+        first.join(5)
+
+        for question in self.QUESTIONS:
+            self.assertEqual(results[question], (self.answer(question), False))
+        self.assertEqual(flight.stats()['coalesced'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
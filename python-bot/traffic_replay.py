@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Capture real chatbot traffic and replay it for performance testing.
+
+  extract  Build an anonymized replay file from the admin backend chat_logs
+           table and/or JSON logs ('Chat interaction logged' lines).
+  replay   Send the recorded questions to NLPProcessor in-process or to a
+           running bot over HTTP, at recorded pace, sped up, or open-loop
+           at a fixed QPS. Reports latency percentiles and can save answers.
+  diff     Compare two saved answer files (e.g. two builds) for drift.
+
+Usage:
+  python traffic_replay.py extract -o replay.jsonl
+  python traffic_replay.py replay replay.jsonl --mode speed --speed 20 --answers old.jsonl
+  python traffic_replay.py replay replay.jsonl --target http://127.0.0.1:5000 --mode qps --qps 30
+  python traffic_replay.py diff old.jsonl new.jsonl
+
+Replaying against HTTP goes through admission control and admin backend
+logging; start the target with ADMISSION_ENABLED=0 for load tests.
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(BASE_DIR, '..', 'admin-backend', 'database.sqlite')
+
+# Personal data that shows up in free-text questions
+_SCRUBBERS = [
+    (re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+'), '<email>'),
+    (re.compile(r'https?://\S+|www\.\S+'), '<url>'),
+    (re.compile(r'(?:\+62|62|0)8[\d\s-]{7,14}\d'), '<phone>'),
+    (re.compile(r'\b\d{16}\b'), '<nik>'),
+    (re.compile(r'\b\d{6,}\b'), '<number>'),
+]
+
+
+def anonymize(text):
+    """Replace emails, URLs, phone numbers and long ID-like numbers."""
+    text = (text or '').strip()
+    for pattern, placeholder in _SCRUBBERS:
+        text = pattern.sub(placeholder, text)
+    return text
+
+
+def _parse_ts(value):
+    """Parse timestamps used by sequelize/winston into epoch seconds."""
+    value = (value or '').strip()
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f %z', '%Y-%m-%d %H:%M:%S %z', '%Y-%m-%dT%H:%M:%S.%fZ',
+                '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S'):
+        try:
+            dt = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+    return None
+
+
+def _from_db(path, since):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT createdAt, environment, question FROM chat_logs ORDER BY createdAt").fetchall()
+    finally:
+        conn.close()
+    for created, env, question in rows:
+        ts = _parse_ts(created)
+        if ts is not None and (since is None or ts >= since):
+            yield ts, env, question
+
+
+def _from_log(path, since):
+    with open(path, 'r', encoding='utf-8', errors='replace') as fh:
+        for line in fh:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            question = entry.get('question')
+            env = entry.get('environment') or entry.get('env')
+            if not isinstance(question, str) or not env:
+                continue
+            ts = _parse_ts(entry.get('timestamp'))
+            if ts is not None and (since is None or ts >= since):
+                yield ts, env, question
+
+
+def extract(args):
+    since = _parse_ts(args.since) if args.since else None
+    sources = []
+    if args.db or not args.log:
+        sources.append(('db', args.db or DEFAULT_DB))
+    sources += [('log', p) for p in args.log or []]
+
+    records, seen = [], set()
+    for kind, path in sources:
+        if not os.path.isfile(path):
+            print(f"Skipping missing source: {path}")
+            continue
+        reader = _from_db if kind == 'db' else _from_log
+        count = 0
+        for ts, env, question in reader(path, since):
+            question = anonymize(question)
+            if not question:
+                continue
+            # the same interaction can be both in the table and in the log
+            key = (int(ts), env.lower(), question[:100].lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            records.append((ts, env.lower(), question))
+            count += 1
+        print(f"{path}: {count} questions")
+
+    records.sort(key=lambda r: r[0])
+    if args.env:
+        records = [r for r in records if r[1] in args.env]
+    start = records[0][0] if records else 0
+    with open(args.output, 'w', encoding='utf-8') as out:
+        out.write(json.dumps({'version': 1, 'created': datetime.now().isoformat(),
+                              'start': start, 'count': len(records),
+                              'sources': [p for _, p in sources]}) + "\n")
+        for ts, env, question in records:
+            out.write(json.dumps([round(ts - start, 3), env, question], ensure_ascii=False) + "\n")
+    print(f"Wrote {len(records)} records to {args.output}")
+
+
+def load_replay(path):
+    with open(path, 'r', encoding='utf-8') as fh:
+        header = json.loads(fh.readline())
+        records = [json.loads(line) for line in fh if line.strip()]
+    return header, records
+
+
+def schedule(records, mode, speed=1.0, qps=10.0, max_gap=5.0):
+    """Offsets (seconds from start) at which each record is sent."""
+    offsets, clock, prev = [], 0.0, None
+    for i, (offset, _, _) in enumerate(records):
+        if mode == 'qps':
+            offsets.append(i / qps)
+            continue
+        gap = 0.0 if prev is None else max(0.0, offset - prev)
+        prev = offset
+        clock += min(gap, max_gap) / (speed if mode == 'speed' else 1.0)
+        offsets.append(clock)
+    return offsets
+
+
+class EngineTarget:
+    """Calls NLPProcessor.get_response in-process, one processor per env."""
+
+    def __init__(self):
+        from nlp_processor import NLPProcessor
+        self._cls = NLPProcessor
+        self._processors = {}
+        self._lock = threading.Lock()
+
+    def _processor(self, env):
+        fname = f'faq_{env}.json'
+        if not os.path.isfile(os.path.join(BASE_DIR, 'data', fname)):
+            fname = 'faq_stunting.json'
+        with self._lock:
+            if fname not in self._processors:
+                self._processors[fname] = self._cls(faq_file=fname)
+            return self._processors[fname]
+
+    def warm(self, envs):
+        for env in envs:
+            self._processor(env)
+
+    def ask(self, env, question):
+        return self._processor(env).get_response(question, env=env)
+
+
+class HttpTarget:
+    """POSTs to /ask on a running bot."""
+
+    def __init__(self, base_url, timeout=30):
+        import requests
+        self._session = requests.Session()
+        self._url = base_url.rstrip('/') + '/ask'
+        self._timeout = timeout
+
+    def warm(self, envs):
+        pass
+
+    def ask(self, env, question):
+        r = self._session.post(self._url, json={'question': question, 'env': env}, timeout=self._timeout)
+        data = r.json()
+        if r.status_code >= 400:
+            data.setdefault('status', 'error')
+            data['http_status'] = r.status_code
+        return data
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def replay(args):
+    header, records = load_replay(args.file)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("Replay file is empty")
+        return
+    http = args.target.startswith('http')
+    target = HttpTarget(args.target) if http else EngineTarget()
+    # in-process get_response() is CPU-bound and shares one GIL, so parallel
+    # engine calls would measure thread contention instead of service time
+    concurrency = args.concurrency or (16 if http else 1)
+    target.warm(sorted({r[1] for r in records}))
+
+    offsets = schedule(records, args.mode, speed=args.speed, qps=args.qps, max_gap=args.max_gap)
+    results = [None] * len(records)
+    # start-to-finish latency is measured from the scheduled send time so
+    # queueing behind slow requests counts (open-loop, no coordinated omission)
+    def run(i, due):
+        _, env, question = records[i]
+        begin = time.perf_counter()
+        try:
+            resp = target.ask(env, question)
+            error = resp.get('status') == 'error'
+        except Exception as e:
+            resp, error = {'status': 'error', 'error': str(e)}, True
+        end = time.perf_counter()
+        results[i] = {'i': i, 'env': env, 'question': question,
+                      'latency': end - due, 'service': end - begin, 'error': error,
+                      'status': resp.get('status'), 'faq_id': resp.get('faq_id'),
+                      'category': resp.get('category'), 'confidence': resp.get('confidence'),
+                      'source_env': resp.get('source_env')}
+
+    print(f"Replaying {len(records)} requests ({args.mode}) against {args.target}, concurrency {concurrency}")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, offset in enumerate(offsets):
+            due = started + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, i, due)
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(r['latency'] * 1000 for r in results)
+    service = sorted(r['service'] * 1000 for r in results)
+    errors = sum(1 for r in results if r['error'])
+    print(f"Completed {len(results)} requests in {elapsed:.2f}s ({len(results) / elapsed:.1f} req/s), errors: {errors}")
+    for label, values in (('latency', latencies), ('service', service)):
+        print(f"  {label:8s} p50={percentile(values, 50):.1f}ms p90={percentile(values, 90):.1f}ms "
+              f"p95={percentile(values, 95):.1f}ms p99={percentile(values, 99):.1f}ms max={values[-1]:.1f}ms")
+
+    if args.answers:
+        with open(args.answers, 'w', encoding='utf-8') as out:
+            for r in results:
+                out.write(json.dumps(r, ensure_ascii=False) + "\n")
+        print(f"Answers written to {args.answers}")
+
+
+def diff(args):
+    def load(path):
+        with open(path, 'r', encoding='utf-8') as fh:
+            return {r['i']: r for r in (json.loads(line) for line in fh if line.strip())}
+
+    old, new = load(args.old), load(args.new)
+    common = sorted(set(old) & set(new))
+    if not common:
+        print("No common requests to compare")
+        return
+    changed, deltas = [], []
+    for i in common:
+        a, b = old[i], new[i]
+        if (a['status'], a['faq_id'], a.get('source_env')) != (b['status'], b['faq_id'], b.get('source_env')):
+            changed.append((a, b))
+        if a.get('confidence') is not None and b.get('confidence') is not None:
+            deltas.append(b['confidence'] - a['confidence'])
+    lat_a = sorted(old[i]['service'] * 1000 for i in common)
+    lat_b = sorted(new[i]['service'] * 1000 for i in common)
+
+    print(f"Compared {len(common)} requests")
+    print(f"  answer agreement: {(1 - len(changed) / len(common)) * 100:.2f}% ({len(changed)} changed)")
+    if deltas:
+        print(f"  confidence delta: mean={sum(deltas) / len(deltas):+.4f} "
+              f"max|d|={max(abs(d) for d in deltas):.4f}")
+    print(f"  service p50 {percentile(lat_a, 50):.1f}ms -> {percentile(lat_b, 50):.1f}ms, "
+          f"p95 {percentile(lat_a, 95):.1f}ms -> {percentile(lat_b, 95):.1f}ms")
+    for a, b in changed[:args.show]:
+        print(f"  [{a['env']}] {a['question'][:60]!r}: "
+              f"{a['status']}/{a['faq_id']} -> {b['status']}/{b['faq_id']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Capture and replay chatbot traffic')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('extract', help='build an anonymized replay file')
+    p.add_argument('--db', help=f'chat_logs sqlite database (default: {DEFAULT_DB})')
+    p.add_argument('--log', action='append', help='JSON log file with question/environment fields (repeatable)')
+    p.add_argument('--since', help="only traffic after this time, e.g. '2025-09-01 00:00:00'")
+    p.add_argument('--env', action='append', help='only these environments (repeatable)')
+    p.add_argument('-o', '--output', default='replay.jsonl')
+    p.set_defaults(func=extract)
+
+    p = sub.add_parser('replay', help='replay a file against the engine or a running bot')
+    p.add_argument('file')
+    p.add_argument('--target', default='engine', help="'engine' (in-process) or a base URL like http://127.0.0.1:5000")
+    p.add_argument('--mode', choices=['recorded', 'speed', 'qps'], default='recorded')
+    p.add_argument('--speed', type=float, default=10.0, help='speed multiplier for --mode speed')
+    p.add_argument('--qps', type=float, default=10.0, help='open-loop request rate for --mode qps')
+    p.add_argument('--max-gap', type=float, default=5.0, help='cap idle gaps between recorded requests (seconds)')
+    p.add_argument('--concurrency', type=int,
+                   help='parallel requests (default: 16 for a URL, 1 for the in-process engine)')
+    p.add_argument('--limit', type=int)
+    p.add_argument('--answers', help='write per-request results for diff')
+    p.set_defaults(func=replay)
+
+    p = sub.add_parser('diff', help='compare answers from two replays')
+    p.add_argument('old')
+    p.add_argument('new')
+    p.add_argument('--show', type=int, default=10, help='changed answers to print')
+    p.set_defaults(func=diff)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
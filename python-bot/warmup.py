@@ -0,0 +1,82 @@
+import json
+import os
+import sqlite3
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CHAT_DB = os.path.join(BASE_DIR, '..', 'admin-backend', 'database.sqlite')
+DEFAULT_SAMPLE_FILE = os.path.join(BASE_DIR, 'data', 'warmup_questions.json')
+
+
+def _from_chat_logs(db_path, envs, limit, days):
+    """Most frequent recent questions per environment from the admin chat log table."""
+    questions = {}
+    if not db_path or not os.path.isfile(db_path):
+        return questions
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=2)
+    try:
+        since = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() - days * 86400))
+        for env in envs:
+            rows = conn.execute(
+                "SELECT MIN(question), COUNT(*) AS n FROM chat_logs "
+                "WHERE environment = ? AND createdAt >= ? "
+                "GROUP BY LOWER(TRIM(question)) ORDER BY n DESC LIMIT ?",
+                (env, since, limit)
+            ).fetchall()
+            picked = [r[0] for r in rows if r[0] and r[0].strip()]
+            if picked:
+                questions[env] = picked
+    finally:
+        conn.close()
+    return questions
+
+
+def _from_sample_file(path, envs, limit):
+    """Questions shipped with the bot, as {"<env>": ["question", ...]}."""
+    if not path or not os.path.isfile(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as fh:
+        data = json.load(fh)
+    return {env: list(data.get(env) or [])[:limit] for env in envs if data.get(env)}
+
+
+def load_warmup_questions(envs, limit=20, days=30, db_path=None, sample_file=None):
+    """Pick the questions to replay during warm-up for each environment.
+
+    Recent chat logs are preferred; environments without logged traffic fall
+    back to the shipped sample file. Returns (questions_by_env, source_by_env).
+    """
+    db_path = db_path or os.environ.get('WARMUP_DB_PATH') or DEFAULT_CHAT_DB
+    sample_file = sample_file or os.environ.get('WARMUP_SAMPLE_FILE') or DEFAULT_SAMPLE_FILE
+    questions, sources = {}, {}
+    try:
+        for env, qs in _from_chat_logs(db_path, envs, limit, days).items():
+            questions[env] = qs
+            sources[env] = 'chat_logs'
+    except Exception as e:
+        print(f"Warning: could not read warm-up questions from chat logs: {e}")
+    missing = [env for env in envs if env not in questions]
+    if missing:
+        try:
+            for env, qs in _from_sample_file(sample_file, missing, limit).items():
+                questions[env] = qs
+                sources[env] = 'sample_file'
+        except Exception as e:
+            print(f"Warning: could not read warm-up sample file: {e}")
+    return questions, sources
+
+
+def replay(processor, env, questions):
+    """Run questions through the engine so caches are hot before real traffic."""
+    start = time.perf_counter()
+    errors = 0
+    for q in questions:
+        try:
+            processor.get_response(q, env=env)
+        except Exception:
+            errors += 1
+    return {
+        'questions': len(questions),
+        'errors': errors,
+        'seconds': round(time.perf_counter() - start, 3)
+    }
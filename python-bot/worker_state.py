@@ -0,0 +1,74 @@
+import atexit
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class WorkerState:
+    """Small per-worker status file used to coordinate rolling reloads.
+
+    Every gunicorn worker writes `worker-<pid>.json` into `state_dir` with its
+    parent (master) pid and preparation stage. The restart watcher reads these
+    files to tell when a replacement worker has finished indexing before it
+    retires an old one. The file is removed when the worker exits.
+    """
+
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+        self.pid = os.getpid()
+        self.path = os.path.join(state_dir, f"worker-{self.pid}.json") if state_dir else None
+        self._lock = threading.Lock()
+        self._state = {
+            'pid': self.pid,
+            'ppid': os.getppid(),
+            'stage': 'starting',
+            'ready': False,
+            'started_at': datetime.now().isoformat(),
+            'ready_at': None
+        }
+
+    @classmethod
+    def from_env(cls):
+        """State files go to WORKER_STATE_DIR (default run/); empty disables them."""
+        default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run')
+        return cls(os.environ.get('WORKER_STATE_DIR', default_dir) or None)
+
+    @staticmethod
+    def read(state_dir, pid):
+        """State written by worker `pid`, or None when it has no (readable) file."""
+        try:
+            with open(os.path.join(state_dir, f"worker-{pid}.json"), 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def update(self, **fields):
+        """Merge fields into the state and rewrite the file atomically."""
+        with self._lock:
+            self._state.update(fields)
+            self._state['updated_at'] = datetime.now().isoformat()
+            if not self.path:
+                return
+            try:
+                os.makedirs(self.state_dir, exist_ok=True)
+                tmp = f"{self.path}.tmp"
+                with open(tmp, 'w', encoding='utf-8') as fh:
+                    json.dump(self._state, fh)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"Warning: could not write worker state {self.path}: {e}")
+
+    def remove(self):
+        if not self.path:
+            return
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def register(self):
+        """Write the initial state and remove the file again at exit."""
+        self.update()
+        atexit.register(self.remove)
+        return self